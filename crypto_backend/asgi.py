@@ -1,17 +1,49 @@
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from django.urls import path
-from portfolio.consumers import CryptoPriceConsumer
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crypto_backend.settings')
 
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+# Initialise Django (settings, app registry) before importing anything that
+# touches models or settings. Async views are served natively by this app.
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter
+
+_websocket_app = None
+
+def _build_websocket_app():
+    # Channels' auth stack and the consumers (and through them the price
+    # service) are only imported once the first socket connects.
+    from channels.auth import AuthMiddlewareStack
+    from channels.routing import URLRouter
+    from django.urls import path
+    from portfolio.consumers import CryptoPriceConsumer, PortfolioValuationConsumer
+
+    return AuthMiddlewareStack(
         URLRouter([
             path("ws/prices/", CryptoPriceConsumer.as_asgi()),
+            path("ws/portfolios/<int:portfolio_id>/", PortfolioValuationConsumer.as_asgi()),
         ])
-    ),
-})
\ No newline at end of file
+    )
+
+async def websocket_app(scope, receive, send):
+    global _websocket_app
+    if _websocket_app is None:
+        _websocket_app = _build_websocket_app()
+    return await _websocket_app(scope, receive, send)
+
+_router = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": websocket_app,
+})
+
+_loop_bound = False
+
+async def application(scope, receive, send):
+    global _loop_bound
+    if not _loop_bound:
+        # Lets the price service keep one HTTP session on this long-lived loop.
+        from portfolio.coingecko import bind_server_loop
+        bind_server_loop()
+        _loop_bound = True
+    return await _router(scope, receive, send)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Read-replica routing.
+
+Reads are only sent to a replica while ``ReplicaRoutingMiddleware`` has
+marked the current request as replica-safe: a GET/HEAD to one of
+``REPLICA_READ_VIEWS`` from a client that has not written recently. Any
+write pins the rest of the request, and the client (via a short-lived
+cookie) for ``REPLICA_PIN_SECONDS``, to the primary. Replicas that fail to
+connect are skipped for ``REPLICA_RETRY_SECONDS``.
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_pin'
+
+_replica_ok = contextvars.ContextVar('replica_ok', default=False)
+_unhealthy_until = {}
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _healthy(alias):
+    if _unhealthy_until.get(alias, 0) > time.monotonic():
+        return False
+    if connections[alias].connection is not None or _in_event_loop():
+        # Async ORM calls resolve the alias on the loop, then again in the
+        # worker thread that runs the query; only probe from the latter.
+        return True
+    try:
+        connections[alias].ensure_connection()
+        return True
+    except OperationalError as e:
+        logger.warning(f"⚠️ Replica {alias} unavailable, using primary: {e}")
+        _unhealthy_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_ok.get():
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.REPLICA_DATABASES if _healthy(alias)]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes for the remainder of this request.
+        _replica_ok.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from either may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Marks replica-safe requests and sets the read-your-writes pin cookie."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _replica_safe(self, request):
+        if request.method not in ('GET', 'HEAD') or request.COOKIES.get(PIN_COOKIE):
+            return False
+        try:
+            return resolve(request.path_info).url_name in settings.REPLICA_READ_VIEWS
+        except Resolver404:
+            return False
+
+    def _finish(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                secure=not settings.DEBUG,
+                samesite='Lax' if settings.DEBUG else 'None',
+            )
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _replica_ok.set(self._replica_safe(request))
+        try:
+            return self._finish(request, self.get_response(request))
+        finally:
+            _replica_ok.reset(token)
+
+    async def __acall__(self, request):
+        token = _replica_ok.set(self._replica_safe(request))
+        try:
+            return self._finish(request, await self.get_response(request))
+        finally:
+            _replica_ok.reset(token)
@@ -37,6 +37,8 @@ INSTALLED_APPS = [
 # Middleware
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'portfolio.profiling.ProfilingMiddleware',
+    'crypto_backend.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -74,6 +76,18 @@ DATABASES = {
     'default': dj_database_url.config(default=os.getenv("DATABASE_URL"))
 }
 
+# Read replicas (optional; comma-separated URLs, see crypto_backend/db_router.py)
+REPLICA_DATABASES = []
+for i, url in enumerate(u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()):
+    alias = f'replica_{i + 1}'
+    DATABASES[alias] = {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['crypto_backend.db_router.ReplicaRouter']
+REPLICA_READ_VIEWS = {'portfolios', 'portfolio-detail', 'portfolio-transactions', 'portfolio-analytics'}
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))    # Primary-only window after a client writes
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', '30'))
+
 # Caching (Redis)
 CACHES = {
     "default": {
@@ -81,14 +95,36 @@ CACHES = {
         "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # Stores portfolio.cache_codec entries unpickled; see that module.
+            "SERIALIZER": "portfolio.cache_codec.CacheSerializer",
         }
     }
 }
 
-# Channels (In-memory for now — replace with RedisChannelLayer in prod if needed)
+# Price tick archive (append-only, memory-mapped)
+TICK_ARCHIVE_ENABLED = os.getenv('TICK_ARCHIVE_ENABLED', 'True').lower() in ('true', '1', 't')
+TICK_ARCHIVE_DIR = os.getenv('TICK_ARCHIVE_DIR', os.path.join(BASE_DIR, 'ticks'))
+
+# Warm-up (/warmup/ and `manage.py warmup`)
+WARMUP_PRELOAD_PRICES = os.getenv('WARMUP_PRELOAD_PRICES', 'True').lower() in ('true', '1', 't')
+WARMUP_TOKEN = os.getenv('WARMUP_TOKEN', '')   # Required X-Warmup-Token for POST /warmup/; empty disables it
+
+# Profiling (opt-in; see portfolio/profiling.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ('true', '1', 't')
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')              # X-Profile header value that forces a profile
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SLOW_MS = float(os.getenv('PROFILING_SLOW_MS', '0'))   # 0 disables threshold capture
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', '50'))
+PROFILING_SAMPLER_INTERVAL = 0.005
+
+# Channels (Redis, so group sends reach sockets held by other workers and by
+# `manage.py watch_alerts`)
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [REDIS_URL],
+        },
     },
 }
 
@@ -1,13 +1,31 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
 def health_check(request):
     """Simple health check endpoint"""
     return JsonResponse({'status': 'healthy', 'message': 'Django backend is running!'})
 
+@csrf_exempt
+@require_POST
+def warmup(request):
+    """Pre-connect pools and prime caches; call once after a cold start with X-Warmup-Token"""
+    token = settings.WARMUP_TOKEN
+    if not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get('X-Warmup-Token', ''), token):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    from portfolio.warmup import warm_up
+    return JsonResponse({'status': 'warm', 'steps': warm_up()})
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('portfolio.urls')),  
-    path('health/', health_check)
+    path('health/', health_check),
+    path('warmup/', warmup)
 ]
\ No newline at end of file
@@ -0,0 +1,312 @@
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ABOVE = 'above'
+BELOW = 'below'
+ALERT_DIRECTIONS = [(ABOVE, 'Crosses above'), (BELOW, 'Crosses below')]
+ALERTS_SEQ_KEY = 'price_alerts:seq'           # Number of the latest alert change
+ALERTS_CHANGE_KEY = 'price_alerts:change'     # One cache entry per change, suffixed with its number
+ALERTS_CHANGE_TTL = 3600
+ALERTS_CHANGE_LOG_SIZE = 10_000               # Further behind than this, a worker reloads instead
+
+
+class _ThresholdBook:
+    """Thresholds for one coin and direction, kept sorted with parallel alert ids."""
+
+    def __init__(self):
+        self.thresholds = array('d')
+        self.ids = array('q')
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def load(self, pairs: List[Tuple[float, int]]):
+        pairs.sort()
+        self.thresholds = array('d', (t for t, _ in pairs))
+        self.ids = array('q', (i for _, i in pairs))
+
+    def add(self, threshold: float, alert_id: int):
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.ids.insert(i, alert_id)
+
+    def remove(self, threshold: float, alert_id: int) -> bool:
+        lo = bisect_left(self.thresholds, threshold)
+        hi = bisect_right(self.thresholds, threshold)
+        for i in range(lo, hi):
+            if self.ids[i] == alert_id:
+                del self.thresholds[i]
+                del self.ids[i]
+                return True
+        return False
+
+    def pop_range(self, lo: int, hi: int) -> List[int]:
+        if hi <= lo:
+            return []
+        fired = self.ids[lo:hi].tolist()
+        del self.thresholds[lo:hi]
+        del self.ids[lo:hi]
+        return fired
+
+
+class AlertEvaluator:
+    """
+    In-memory index of active one-shot price alerts.
+
+    For every coin, "above" and "below" thresholds live in sorted arrays. On
+    each tick the thresholds crossed between the previous and the current
+    price form one contiguous slice, located with two bisects and removed in
+    one step, so a tick costs O(log n + fired) rather than O(alerts).
+    The first price seen for a coin only sets the baseline.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, Dict[str, _ThresholdBook]] = {}
+        self._alerts: Dict[int, Tuple[str, str, float]] = {}
+        self._last_prices: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def _book(self, coin_id: str, direction: str) -> _ThresholdBook:
+        books = self._books.setdefault(coin_id, {ABOVE: _ThresholdBook(), BELOW: _ThresholdBook()})
+        return books[direction]
+
+    def load(self, alerts: Iterable[Tuple[int, str, str, float]]):
+        """Replace the index with ``(alert_id, coin_id, direction, threshold)`` rows."""
+        grouped: Dict[Tuple[str, str], List[Tuple[float, int]]] = {}
+        index = {}
+        for alert_id, coin_id, direction, threshold in alerts:
+            coin_id = coin_id.lower()
+            grouped.setdefault((coin_id, direction), []).append((threshold, alert_id))
+            index[alert_id] = (coin_id, direction, threshold)
+
+        with self._lock:
+            self._books = {}
+            for (coin_id, direction), pairs in grouped.items():
+                self._book(coin_id, direction).load(pairs)
+            self._alerts = index
+
+    def add(self, alert_id: int, coin_id: str, direction: str, threshold: float):
+        coin_id = coin_id.lower()
+        with self._lock:
+            if alert_id in self._alerts:
+                return
+            self._book(coin_id, direction).add(threshold, alert_id)
+            self._alerts[alert_id] = (coin_id, direction, threshold)
+
+    def remove(self, alert_id: int):
+        with self._lock:
+            entry = self._alerts.pop(alert_id, None)
+            if entry:
+                coin_id, direction, threshold = entry
+                self._book(coin_id, direction).remove(threshold, alert_id)
+
+    def coin_ids(self) -> List[str]:
+        """Coins with at least one active alert."""
+        with self._lock:
+            return sorted(coin_id for coin_id, books in self._books.items() if any(len(b) for b in books.values()))
+
+    def on_price(self, coin_id: str, price: float) -> List[int]:
+        """Record a tick and return the ids of alerts it fired (removed from the index)."""
+        coin_id = coin_id.lower()
+        with self._lock:
+            previous: Optional[float] = self._last_prices.get(coin_id)
+            self._last_prices[coin_id] = price
+
+            books = self._books.get(coin_id)
+            if previous is None or books is None or price == previous:
+                return []
+
+            if price > previous:
+                # Upward move fires "above" thresholds in (previous, price].
+                book = books[ABOVE]
+                fired = book.pop_range(
+                    bisect_right(book.thresholds, previous),
+                    bisect_right(book.thresholds, price),
+                )
+            else:
+                # Downward move fires "below" thresholds in [price, previous).
+                book = books[BELOW]
+                fired = book.pop_range(
+                    bisect_left(book.thresholds, price),
+                    bisect_left(book.thresholds, previous),
+                )
+
+            for alert_id in fired:
+                del self._alerts[alert_id]
+            return fired
+
+    def on_prices(self, prices: Dict) -> List[Tuple[int, str, float]]:
+        """Feed a ``simple/price`` body; returns ``(alert_id, coin_id, price)`` per fired alert."""
+        fired = []
+        for coin_id, data in prices.items():
+            if not isinstance(data, dict) or data.get("usd") is None:
+                continue
+            price = float(data["usd"])
+            fired.extend((alert_id, coin_id, price) for alert_id in self.on_price(coin_id, price))
+        return fired
+
+
+class AlertService:
+    """
+    Owns the process-wide evaluator and persists / delivers fired alerts.
+
+    Every worker keeps its own index. Creating or deleting an alert appends
+    an entry to a short change log in the shared cache, numbered by
+    ``ALERTS_SEQ_KEY``; each worker applies the entries after the last one
+    it saw, and only reloads from the database when it has fallen further
+    behind than the log keeps (or the log was lost).
+    """
+
+    def __init__(self):
+        self.evaluator = AlertEvaluator()
+        self._loaded = False
+        self._seq = 0
+        self._load_lock = threading.Lock()
+
+    def _shared_seq(self) -> Optional[int]:
+        from django.core.cache import cache
+
+        try:
+            seq = cache.get(ALERTS_SEQ_KEY)
+            if seq is None:
+                cache.add(ALERTS_SEQ_KEY, 0, timeout=None)
+                seq = cache.get(ALERTS_SEQ_KEY)
+            return seq
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read price alert changes: {e}")
+            return None
+
+    def _publish(self, change: Tuple) -> Optional[int]:
+        from django.core.cache import cache
+
+        try:
+            try:
+                seq = cache.incr(ALERTS_SEQ_KEY)
+            except ValueError:
+                cache.add(ALERTS_SEQ_KEY, 0, timeout=None)
+                seq = cache.incr(ALERTS_SEQ_KEY)
+            cache.set(f"{ALERTS_CHANGE_KEY}:{seq}", change, ALERTS_CHANGE_TTL)
+            return seq
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish price alert change: {e}")
+            return None
+
+    def _apply(self, change: Tuple):
+        if change[0] == 'add':
+            self.evaluator.add(*change[1:])
+        else:
+            self.evaluator.remove(change[1])
+
+    def _catch_up(self, seq: int) -> bool:
+        """Apply logged changes up to ``seq``; False if the log can't cover the gap."""
+        from django.core.cache import cache
+
+        if seq < self._seq or seq - self._seq > ALERTS_CHANGE_LOG_SIZE:
+            return False
+        keys = [f"{ALERTS_CHANGE_KEY}:{n}" for n in range(self._seq + 1, seq + 1)]
+        try:
+            changes = cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read price alert changes: {e}")
+            return False
+        applied = 0
+        for key in keys:
+            if key not in changes:
+                break
+            self._apply(changes[key])
+            applied += 1
+        if any(key in changes for key in keys[applied:]):
+            return False   # A hole before later changes: that entry is lost
+        # Missing entries at the tail are still being written; retry next tick.
+        self._seq += applied
+        return True
+
+    def _reload(self, seq: int):
+        from .models import PriceAlert
+
+        rows = PriceAlert.objects.filter(triggered_at__isnull=True).values_list(
+            'id', 'coin_id', 'direction', 'threshold'
+        )
+        self.evaluator.load(rows.iterator())
+        self._seq = seq
+        self._loaded = True
+        logger.info(f"🔔 Loaded {len(self.evaluator)} active price alerts")
+
+    def ensure_loaded(self):
+        seq = self._shared_seq()
+        if self._loaded and (seq is None or seq == self._seq):
+            return
+        with self._load_lock:
+            if self._loaded and (seq is None or seq == self._seq):
+                return
+            if not self._loaded or not self._catch_up(seq):
+                # seq was read before loading, so changes made meanwhile are
+                # replayed next time; adds and removes are idempotent.
+                self._reload(seq or 0)
+
+    def _record(self, change: Tuple):
+        seq = self._publish(change)
+        if self._loaded:
+            self._apply(change)
+            with self._load_lock:
+                if seq == self._seq + 1:
+                    self._seq = seq
+
+    def track(self, alert):
+        self._record(('add', alert.id, alert.coin_id, alert.direction, alert.threshold))
+
+    def untrack(self, alert_id):
+        self._record(('remove', alert_id))
+
+    def watched_coin_ids(self) -> List[str]:
+        """Coins with active alerts, for the periodic fetch in ``watch_alerts``."""
+        self.ensure_loaded()
+        return self.evaluator.coin_ids()
+
+    def process_tick(self, prices: Dict):
+        """Evaluate a fresh price tick. Must be called from a sync context."""
+        self.ensure_loaded()
+        fired = self.evaluator.on_prices(prices)
+        if fired:
+            self._deliver(fired)
+        return fired
+
+    def _deliver(self, fired):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from django.utils import timezone
+        from .models import PriceAlert
+
+        now = timezone.now()
+        prices = {alert_id: price for alert_id, _, price in fired}
+        # Several workers can cross the same threshold; only the one whose
+        # conditional update succeeds delivers the alert.
+        claimed = [
+            alert_id for alert_id, price in prices.items()
+            if PriceAlert.objects.filter(id=alert_id, triggered_at__isnull=True).update(
+                triggered_at=now, triggered_price=price,
+            )
+        ]
+        alerts = list(PriceAlert.objects.filter(id__in=claimed))
+        logger.info(f"🔔 {len(alerts)} price alerts fired")
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        for alert in alerts:
+            async_to_sync(channel_layer.group_send)(f"alerts_{alert.portfolio_id}", {
+                'type': 'price_alert',
+                'alert': alert.to_dict(),
+            })
+
+
+# Singleton
+alert_service = AlertService()
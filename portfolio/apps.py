@@ -5,4 +5,10 @@ class PortfolioConfig(AppConfig):
     name = 'portfolio'
 
     def ready(self):
-        import portfolio.signals  # <-- this is required to trigger it
\ No newline at end of file
+        import portfolio.signals  # <-- this is required to trigger it
+
+        from django.conf import settings
+        if settings.PROFILING_ENABLED:
+            from django.db.backends.signals import connection_created
+            from portfolio.profiling import install_sql_hook
+            connection_created.connect(install_sql_hook)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Compact binary encoding for cached CoinGecko bodies.
+
+Every entry starts with ``MAGIC`` and a format byte whose high bit marks a
+zlib-compressed payload:
+
+- ``PRICES_V1``: a ``simple/price`` body as a fixed columnar layout - a
+  ``<BHI`` header (field mask, coin count, id block length), the
+  comma-joined ids, then one little-endian column per present field
+  (``usd`` and ``usd_24h_change`` as float64, ``last_updated_at`` as
+  int64). Never compressed: these are read on every tick and are already
+  dense.
+- ``MSGPACK_V1``: any other JSON-like value (markets rows, search results),
+  compressed once it reaches ``COMPRESS_MIN_BYTES``.
+
+``CacheSerializer`` stores these bytes in Redis as-is instead of pickling
+them; other values keep django-redis' pickle behaviour. ``decode_cached``
+lets a worker decode each version of an entry once rather than on every
+read.
+"""
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+import msgpack
+from django_redis.serializers.pickle import PickleSerializer
+
+KEY_VERSION = 'v2'   # Part of every encoded entry's cache key; bump on incompatible format changes
+MAGIC = 0xC7   # Never the first byte of a pickle (0x80) or an int django-redis stores raw
+PRICES_V1 = 1
+MSGPACK_V1 = 2
+COMPRESSED = 0x80
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 1
+MEMO_SIZE = 256             # Cache keys whose last decoded value is kept per process
+
+_HEADER = struct.Struct('<BHI')
+PRICE_FIELDS = (('usd', 'd'), ('usd_24h_change', 'd'), ('last_updated_at', 'q'))
+_ALL_FIELDS = (1 << len(PRICE_FIELDS)) - 1
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+_memo = {}   # cache key -> (encoded bytes, decoded value)
+_memo_lock = threading.Lock()
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and len(value) > 1 and value[0] == MAGIC
+
+
+def _column(typecode, values):
+    column = array(typecode, values)
+    if _BIG_ENDIAN:
+        column.byteswap()
+    return column.tobytes()
+
+
+def _pack_prices(prices):
+    """Encode a ``simple/price`` body, or return None if it doesn't fit the layout."""
+    if not isinstance(prices, dict) or not prices or len(prices) > 0xFFFF:
+        return None
+    first = next(iter(prices.values()))
+    if not isinstance(first, dict):
+        return None
+    fields = [(bit, name, code) for bit, (name, code) in enumerate(PRICE_FIELDS) if name in first]
+    if len(fields) != len(first):
+        return None
+
+    columns = {name: [] for _, name, _ in fields}
+    for coin_id, data in prices.items():
+        if not isinstance(coin_id, str) or ',' in coin_id or not isinstance(data, dict) or data.keys() != first.keys():
+            return None
+        for _, name, code in fields:
+            value = data[name]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (code == 'q' and not isinstance(value, int)):
+                return None
+            columns[name].append(value)
+
+    try:
+        body = b''.join(_column(code, columns[name]) for _, name, code in fields)
+    except OverflowError:
+        return None
+    mask = sum(1 << bit for bit, _, _ in fields)
+    ids = ','.join(prices).encode()
+    return _HEADER.pack(mask, len(prices), len(ids)) + ids + body
+
+
+def _unpack_prices(payload):
+    mask, count, ids_len = _HEADER.unpack_from(payload)
+    offset = _HEADER.size
+    ids = bytes(payload[offset:offset + ids_len]).decode().split(',')
+    offset += ids_len
+
+    names, columns = [], []
+    for bit, (name, code) in enumerate(PRICE_FIELDS):
+        if not mask & (1 << bit):
+            continue
+        column = array(code)
+        column.frombytes(payload[offset:offset + count * column.itemsize])
+        if _BIG_ENDIAN:
+            column.byteswap()
+        offset += count * column.itemsize
+        names.append(name)
+        columns.append(column)
+
+    if mask == _ALL_FIELDS:
+        return {
+            coin_id: {'usd': usd, 'usd_24h_change': change, 'last_updated_at': updated}
+            for coin_id, usd, change, updated in zip(ids, *columns)
+        }
+    return {coin_id: dict(zip(names, values)) for coin_id, *values in zip(ids, *columns)}
+
+
+def encode(value):
+    """
+    Encode a cache entry, using the price layout when ``value`` fits it.
+
+    Values msgpack can't represent are returned unchanged (and pickled by
+    the cache as before).
+    """
+    payload = _pack_prices(value)
+    if payload is not None:
+        return bytes((MAGIC, PRICES_V1)) + payload
+
+    try:
+        payload = msgpack.packb(value, use_bin_type=True)
+    except (TypeError, ValueError, OverflowError):
+        return value
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(payload, COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            return bytes((MAGIC, MSGPACK_V1 | COMPRESSED)) + compressed
+    return bytes((MAGIC, MSGPACK_V1)) + payload
+
+
+def decode(data):
+    """Inverse of ``encode``; non-encoded values pass through."""
+    if not is_encoded(data):
+        return data
+    fmt = data[1]
+    payload = memoryview(data)[2:]
+    if fmt & COMPRESSED:
+        payload = zlib.decompress(payload)
+        fmt &= ~COMPRESSED
+    if fmt == PRICES_V1:
+        return _unpack_prices(payload)
+    if fmt == MSGPACK_V1:
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    # Written by a newer schema (e.g. mid-deploy): treat as a cache miss.
+    return None
+
+
+def decode_cached(key, data):
+    """
+    ``decode`` that reuses the previous result while ``key`` still holds the
+    same bytes. The returned value is shared: callers must not mutate it.
+    """
+    if not is_encoded(data):
+        return data
+    hit = _memo.get(key)
+    if hit is not None and hit[0] == data:
+        return hit[1]
+    value = decode(data)
+    with _memo_lock:
+        if key not in _memo and len(_memo) >= MEMO_SIZE:
+            del _memo[next(iter(_memo))]
+        _memo[key] = (bytes(data), value)
+    return value
+
+
+class CacheSerializer(PickleSerializer):
+    """django-redis serializer that passes ``cache_codec`` bytes through unpickled."""
+
+    def dumps(self, value):
+        if is_encoded(value):
+            return bytes(value)
+        return super().dumps(value)
+
+    def loads(self, value):
+        if is_encoded(value):
+            return value
+        return super().loads(value)
@@ -1,11 +1,25 @@
+import asyncio
+import contextvars
 import json
 import logging
+import threading
 import time
 import hashlib
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import List, Dict
+from urllib.parse import quote
+from django.conf import settings
 from django.core.cache import cache
 from django_redis.exceptions import ConnectionInterrupted
+from asgiref.sync import sync_to_async
+from . import cache_codec
+from .alerts import alert_service
+from .profiling import span
+from .valuation import broadcast_prices
+
+# requests, aiohttp and the NumPy-backed tick archive are imported on first
+# use so a cold worker does not pay for them before its first request.
 
 logger = logging.getLogger(__name__)
 
@@ -13,21 +27,134 @@ CACHE_TTL = 180           # Cache duration in seconds
 LOCK_TIMEOUT = 10         # Lock timeout
 POLL_INTERVAL = 0.5       # Poll every 500ms
 MAX_WAIT_TIME = LOCK_TIMEOUT + 2  # Max wait for cache population
+REQUEST_TIMEOUT = 10      # Upstream request timeout in seconds
+MAX_PROXY_URL_LENGTH = 2000  # Split id sets so each proxied URL stays under this
+MAX_IDS_PER_CHUNK = 100
+MAX_PARALLEL_CHUNKS = 4   # Concurrent upstream requests per call
+
+PROXY_URL = "https://api.allorigins.win/get?url="
 
 class CoinGeckoService:
     BASE_URL = "https://api.coingecko.com/api/v3"
 
     def __init__(self):
-        self.session = requests.Session()
+        self._session = None
+        self._async_session = None
+        self._async_session_loop = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    # ---- shared helpers ---------------------------------------------------
+
+    @staticmethod
+    def _cache_key(prefix: str, parts: List[str]) -> str:
+        key_hash = hashlib.md5(",".join(parts).encode()).hexdigest()
+        # Versioned so workers on another entry encoding (mid-deploy or after
+        # a rollback) never read each other's bytes.
+        return f"{prefix}:{cache_codec.KEY_VERSION}:{key_hash}"
+
+    def _prices_url(self, sorted_ids: List[str]) -> str:
+        query_ids = ",".join(sorted_ids)
+        direct_url = (
+            f"{self.BASE_URL}/simple/price?"
+            f"ids={query_ids}&vs_currencies=usd"
+            f"&include_24hr_change=true&include_last_updated_at=true"
+        )
+        return f"{PROXY_URL}{quote(direct_url)}"
+
+    def _markets_url(self, sorted_ids: List[str]) -> str:
+        direct_url = (
+            f"{self.BASE_URL}/coins/markets?"
+            f"vs_currency=usd&ids={','.join(sorted_ids)}"
+        )
+        return f"{PROXY_URL}{quote(direct_url)}"
+
+    def _search_url(self, query: str) -> str:
+        direct_url = f"{self.BASE_URL}/search?query={quote(query)}"
+        return f"{PROXY_URL}{quote(direct_url)}"
+
+    @staticmethod
+    def _chunk_ids(sorted_ids: List[str], url_builder) -> List[List[str]]:
+        """Greedily pack ids into chunks whose proxied URL fits ``MAX_PROXY_URL_LENGTH``."""
+        base = len(url_builder([]))
+        chunks, chunk, length = [], [], base
+        for coin_id in sorted_ids:
+            # Each extra id adds its quoted form plus an encoded comma (%2C).
+            cost = len(quote(coin_id)) + (3 if chunk else 0)
+            if chunk and (length + cost > MAX_PROXY_URL_LENGTH or len(chunk) >= MAX_IDS_PER_CHUNK):
+                chunks.append(chunk)
+                chunk, length = [], base
+                cost = len(quote(coin_id))
+            chunk.append(coin_id)
+            length += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def _merge_chunks(chunks: List[List[str]], results: List[Dict]) -> Dict:
+        merged = {}
+        for chunk, result in zip(chunks, results):
+            if not result:
+                logger.warning(f"🚨 Price chunk of {len(chunk)} ids failed ({chunk[0]}..{chunk[-1]})")
+                continue
+            merged.update(result)
+        return merged
+
+    @staticmethod
+    def _unwrap_proxy(raw):
+        """Return the decoded upstream body from an allorigins response, or None."""
+        if "contents" not in raw:
+            logger.warning("🚨 Missing 'contents' in proxy response")
+            return None
+
+        body = json.loads(raw["contents"])
+        if isinstance(body, dict) and "status" in body and "error_code" in body["status"]:
+            logger.warning(f"🚨 API error (not caching): {body}")
+            return None
+        return body
+
+    def _on_tick(self, prices: Dict):
+        """Hooks run once per fresh upstream price fetch (sync context)."""
+        if settings.TICK_ARCHIVE_ENABLED:
+            from .tick_archive import tick_archive
+            tick_archive.append_prices(prices)
+        try:
+            alert_service.process_tick(prices)
+        except Exception as e:
+            logger.warning(f"🚨 Price alert evaluation failed: {e}")
+        broadcast_prices(prices)
+
+    # ---- sync API ---------------------------------------------------------
 
     def get_prices(self, coin_ids: List[str]) -> Dict:
+        sorted_ids = sorted(set(coin_ids))
+        with span('get_prices'):
+            chunks = self._chunk_ids(sorted_ids, self._prices_url)
+            if len(chunks) <= 1:
+                return self._get_prices(sorted_ids)
+
+            logger.info(f"🧩 Fetching {len(sorted_ids)} ids in {len(chunks)} chunks")
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_CHUNKS, len(chunks))) as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self._get_prices, chunk)
+                    for chunk in chunks
+                ]
+                results = [f.result() for f in futures]
+            return self._merge_chunks(chunks, results)
+
+    def _get_prices(self, coin_ids: List[str]) -> Dict:
         sorted_ids = sorted(coin_ids)
-        key_hash = hashlib.md5(",".join(sorted_ids).encode()).hexdigest()
-        cache_key = f"cached_crypto_prices:{key_hash}"
+        cache_key = self._cache_key("cached_crypto_prices", sorted_ids)
         lock_key = f"{cache_key}:lock"
 
         try:
-            cached = cache.get(cache_key)
+            cached = cache_codec.decode_cached(cache_key, cache.get(cache_key))
             if cached:
                 logger.info("✅ Using cached CoinGecko prices")
                 return cached
@@ -36,33 +163,23 @@ class CoinGeckoService:
 
         if cache.add(lock_key, "locked", LOCK_TIMEOUT):
             try:
-                query_ids = ",".join(sorted_ids)
-                direct_url = (
-                    f"{self.BASE_URL}/simple/price?"
-                    f"ids={query_ids}&vs_currencies=usd"
-                    f"&include_24hr_change=true&include_last_updated_at=true"
-                )
-                proxy_url = f"https://api.allorigins.win/get?url={requests.utils.quote(direct_url)}"
+                proxy_url = self._prices_url(sorted_ids)
                 logger.info(f"🌐 Fetching CoinGecko data via proxy: {proxy_url}")
 
-                response = self.session.get(proxy_url, timeout=10)
+                response = self.session.get(proxy_url, timeout=REQUEST_TIMEOUT)
                 if response.status_code != 200:
                     logger.warning(f"🚨 Proxy response failed: {response.status_code}")
                     return {}
 
-                raw = response.json()
-                if "contents" not in raw:
-                    logger.warning("🚨 Missing 'contents' in proxy response")
-                    return {}
-
-                prices = json.loads(raw["contents"])
-                if "status" in prices and "error_code" in prices["status"]:
-                    logger.warning(f"🚨 API error (not caching): {prices}")
+                prices = self._unwrap_proxy(response.json())
+                if prices is None:
                     return {}
 
                 logger.info(f"🔍 Prices fetched: {prices}")
+                self._on_tick(prices)
+
                 try:
-                    cache.set(cache_key, prices, timeout=CACHE_TTL)
+                    cache.set(cache_key, cache_codec.encode(prices), timeout=CACHE_TTL)
                 except ConnectionInterrupted:
                     logger.warning("⚠️ Redis unavailable while writing cache.")
 
@@ -79,7 +196,7 @@ class CoinGeckoService:
         waited = 0
         while waited < MAX_WAIT_TIME:
             try:
-                fallback = cache.get(cache_key)
+                fallback = cache_codec.decode_cached(cache_key, cache.get(cache_key))
                 if fallback:
                     logger.info("✅ Fetched from cache after waiting")
                     return fallback
@@ -93,5 +210,170 @@ class CoinGeckoService:
         logger.warning("⏰ Timeout waiting for cache.")
         return {}
 
-# Singleton
-coingecko_service = CoinGeckoService()
+    # ---- async API --------------------------------------------------------
+
+    def _get_async_session(self):
+        """
+        Shared session for the ASGI server's loop (see ``bind_server_loop``).
+
+        aiohttp sessions are bound to the loop they were created on, so a
+        session left on a previous loop is closed before it is replaced.
+        """
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session.closed or self._async_session_loop is not loop:
+            self._close_stale_session()
+            self._async_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+            self._async_session_loop = loop
+        return self._async_session
+
+    def _close_stale_session(self):
+        session, loop = self._async_session, self._async_session_loop
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        elif session.connector is not None:
+            # Its loop has stopped, so close() can't be awaited there; close the
+            # pooled transports synchronously instead.
+            session.connector._close()
+            session.detach()
+
+    @asynccontextmanager
+    async def _session_scope(self):
+        import aiohttp
+
+        if asyncio.get_running_loop() is _server_loop:
+            yield self._get_async_session()
+            return
+        # WSGI (runserver, sync gunicorn) and scripts run async code on
+        # short-lived loops: use a session per call so nothing outlives them.
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as session:
+            yield session
+
+    async def _afetch(self, proxy_url: str):
+        async with self._session_scope() as session, session.get(proxy_url) as response:
+            if response.status != 200:
+                logger.warning(f"🚨 Proxy response failed: {response.status}")
+                return None
+            raw = await response.json(content_type=None)
+        return self._unwrap_proxy(raw)
+
+    async def _acached_fetch(self, cache_key: str, proxy_url: str, on_fetch=None):
+        """Async counterpart of the cache / lock / poll flow in ``get_prices``."""
+        lock_key = f"{cache_key}:lock"
+
+        try:
+            cached = cache_codec.decode_cached(cache_key, await cache.aget(cache_key))
+            if cached:
+                logger.info("✅ Using cached CoinGecko data")
+                return cached
+        except ConnectionInterrupted:
+            logger.warning("⚠️ Redis unavailable while reading cache.")
+
+        if await cache.aadd(lock_key, "locked", LOCK_TIMEOUT):
+            try:
+                logger.info(f"🌐 Fetching CoinGecko data via proxy: {proxy_url}")
+                body = await self._afetch(proxy_url)
+                if body is None:
+                    return None
+
+                if on_fetch:
+                    await sync_to_async(on_fetch)(body)
+
+                try:
+                    await cache.aset(cache_key, cache_codec.encode(body), timeout=CACHE_TTL)
+                except ConnectionInterrupted:
+                    logger.warning("⚠️ Redis unavailable while writing cache.")
+
+                return body
+
+            except Exception as e:
+                logger.warning(f"🚨 Proxy fetch error: {e}")
+                return None
+
+            finally:
+                await cache.adelete(lock_key)
+
+        logger.info("⏳ Waiting for another request to populate cache...")
+        waited = 0
+        while waited < MAX_WAIT_TIME:
+            try:
+                fallback = cache_codec.decode_cached(cache_key, await cache.aget(cache_key))
+                if fallback:
+                    logger.info("✅ Fetched from cache after waiting")
+                    return fallback
+            except ConnectionInterrupted:
+                logger.warning("⚠️ Redis unavailable during polling.")
+                break
+
+            await asyncio.sleep(POLL_INTERVAL)
+            waited += POLL_INTERVAL
+
+        logger.warning("⏰ Timeout waiting for cache.")
+        return None
+
+    async def _afetch_chunked(self, prefix: str, coin_ids: List[str], url_builder, on_fetch=None):
+        """Fetch size-bounded chunks with bounded concurrency; returns (chunks, bodies)."""
+        chunks = self._chunk_ids(sorted(set(coin_ids)), url_builder)
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_CHUNKS)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await self._acached_fetch(
+                    self._cache_key(prefix, chunk), url_builder(chunk), on_fetch=on_fetch
+                )
+
+        if len(chunks) > 1:
+            logger.info(f"🧩 Fetching {sum(map(len, chunks))} ids in {len(chunks)} chunks")
+        return chunks, await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+
+    async def aget_prices(self, coin_ids: List[str]) -> Dict:
+        with span('get_prices'):
+            chunks, bodies = await self._afetch_chunked(
+                "cached_crypto_prices", coin_ids, self._prices_url, on_fetch=self._on_tick
+            )
+        return self._merge_chunks(chunks, bodies)
+
+    async def aget_market_data(self, coin_ids: List[str]) -> Dict[str, Dict]:
+        """``coins/markets`` rows keyed by coin id."""
+        chunks, bodies = await self._afetch_chunked("cached_crypto_markets", coin_ids, self._markets_url)
+        return self._merge_chunks(chunks, [{row["id"]: row for row in rows or []} for rows in bodies])
+
+    async def asearch_coins(self, query: str) -> List[Dict]:
+        body = await self._acached_fetch(
+            self._cache_key("cached_crypto_search", [query.lower()]),
+            self._search_url(query),
+        )
+        return [
+            {
+                'id': coin.get('id'),
+                'name': coin.get('name'),
+                'symbol': coin.get('symbol'),
+                'market_cap_rank': coin.get('market_cap_rank'),
+                'thumb': coin.get('thumb'),
+            }
+            for coin in (body or {}).get('coins', [])
+        ]
+
+_server_loop = None
+
+def bind_server_loop():
+    """Record the running ASGI server loop; only it reuses a shared aiohttp session."""
+    global _server_loop
+    _server_loop = asyncio.get_running_loop()
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_coingecko_service() -> CoinGeckoService:
+    """Process-wide service, constructed on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = CoinGeckoService()
+    return _service
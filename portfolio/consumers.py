@@ -2,10 +2,19 @@ import json
 import logging
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
-from portfolio.coingecko import coingecko_service
+from dataclasses import asdict
+from asgiref.sync import sync_to_async
+from portfolio.coingecko import get_coingecko_service
+from portfolio.models import Portfolio, Position
+from portfolio.profiling import profile_tick, profiled
+from portfolio.services import get_portfolio_analytics
+from portfolio.valuation import PRICE_TICKS_GROUP, PortfolioValuation, portfolio_group
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_COINS = ['bitcoin', 'ethereum', 'solana', 'dogecoin', 'cardano', 'polkadot']
+REFRESH_INTERVAL = 30  # Seconds between cached-price refreshes
+
 class CryptoPriceConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         await self.accept()
@@ -15,11 +24,13 @@ class CryptoPriceConsumer(AsyncWebsocketConsumer):
             'message': 'Connected to crypto price updates',
             'status': 'success'
         }))
-        self.coins = ['bitcoin', 'ethereum', 'solana', 'dogecoin', 'cardano', 'polkadot'] 
+        self.coins = list(DEFAULT_COINS)
         self.price_task = asyncio.create_task(self.send_price_updates())
 
     async def disconnect(self, close_code):
         logger.info(f"🔌 WebSocket disconnected: {close_code}")
+        for group in getattr(self, 'alert_groups', set()):
+            await self.channel_layer.group_discard(group, self.channel_name)
         if hasattr(self, 'price_task'):
             self.price_task.cancel()
             logger.info("⛔ Price update task cancelled")
@@ -47,6 +58,19 @@ class CryptoPriceConsumer(AsyncWebsocketConsumer):
                     'message': f'Subscribed to: {", ".join(self.coins)}',
                     'coins': self.coins
                 }))
+            elif data.get('type') == 'subscribe_alerts':
+                portfolio_id = int(data['portfolio_id'])
+                group = f"alerts_{portfolio_id}"
+                if not hasattr(self, 'alert_groups'):
+                    self.alert_groups = set()
+                self.alert_groups.add(group)
+                await self.channel_layer.group_add(group, self.channel_name)
+                logger.info(f"🔔 Subscribed to alerts for portfolio {portfolio_id}")
+
+                await self.send(json.dumps({
+                    'type': 'alert_subscription',
+                    'portfolio_id': portfolio_id
+                }))
         except Exception as e:
             logger.error(f"❌ WebSocket error: {e}")
             await self.send(json.dumps({
@@ -54,15 +78,22 @@ class CryptoPriceConsumer(AsyncWebsocketConsumer):
                 'message': f'Server error: {str(e)}'
             }))
 
+    async def price_alert(self, event):
+        await self.send(json.dumps({
+            'type': 'price_alert',
+            'alert': event['alert']
+        }))
+
     async def send_price_updates(self):
         while True:
             try:
-                prices = await self.fetch_crypto_prices()
-                await self.send(json.dumps({
-                    'type': 'price_update',
-                    'data': prices,
-                    'timestamp': asyncio.get_event_loop().time()
-                }))
+                async with profile_tick('prices.send_price_updates'):
+                    prices = await self.fetch_crypto_prices()
+                    await self.send(json.dumps({
+                        'type': 'price_update',
+                        'data': prices,
+                        'timestamp': asyncio.get_event_loop().time()
+                    }))
                 await asyncio.sleep(30)
             except asyncio.CancelledError:
                 logger.info("🛑 Price update loop cancelled")
@@ -77,5 +108,94 @@ class CryptoPriceConsumer(AsyncWebsocketConsumer):
                 await asyncio.sleep(10)
 
     async def fetch_crypto_prices(self):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, coingecko_service.get_prices, self.coins)
+        # to_thread copies contextvars, so an active profile_tick sees get_prices.
+        return await asyncio.to_thread(get_coingecko_service().get_prices, self.coins)
+
+
+class PortfolioValuationConsumer(AsyncWebsocketConsumer):
+    """
+    Streams one portfolio's valuation: full metrics on connect, then deltas
+    computed from cached holdings whenever a held coin ticks or the ledger
+    changes.
+    """
+
+    async def connect(self):
+        self.portfolio_id = self.scope['url_route']['kwargs']['portfolio_id']
+        try:
+            self.portfolio = await Portfolio.objects.aget(id=self.portfolio_id)
+        except Portfolio.DoesNotExist:
+            await self.close(code=4404)
+            return
+
+        await self.accept()
+        self.groups_joined = [PRICE_TICKS_GROUP, portfolio_group(self.portfolio_id)]
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        logger.info(f"✅ Valuation stream connected for portfolio {self.portfolio_id}")
+
+        analytics = get_portfolio_analytics()
+        positions = await sync_to_async(analytics.load_positions)(self.portfolio)
+        self.valuation = PortfolioValuation()
+        self.valuation.set_positions(positions)
+
+        open_ids = self.valuation.open_coin_ids()
+        prices = await get_coingecko_service().aget_prices(open_ids) if open_ids else {}
+        self.valuation.set_prices(prices)
+
+        await self.send(json.dumps({
+            'type': 'metrics',
+            'portfolio_id': self.portfolio_id,
+            'metrics': asdict(analytics.build_metrics(positions, prices)),
+            'valuation': self.valuation.delta(set(self.valuation.holdings)),
+        }))
+        self.refresh_task = asyncio.create_task(self.refresh_prices())
+
+    async def disconnect(self, close_code):
+        logger.info(f"🔌 Valuation stream disconnected: {close_code}")
+        if hasattr(self, 'refresh_task'):
+            self.refresh_task.cancel()
+        for group in getattr(self, 'groups_joined', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+        if data.get('type') == 'ping':
+            await self.send(json.dumps({'type': 'pong', 'timestamp': data.get('timestamp')}))
+
+    async def send_delta(self, changed):
+        if not changed:
+            return
+        await self.send(json.dumps({
+            'type': 'valuation',
+            'portfolio_id': self.portfolio_id,
+            **self.valuation.delta(changed),
+        }))
+
+    @profiled('valuation.price_tick')
+    async def price_tick(self, event):
+        await self.send_delta(self.valuation.set_prices(event['prices']))
+
+    @profiled('valuation.ledger_changed')
+    async def ledger_changed(self, event):
+        positions = [p async for p in Position.objects.filter(portfolio_id=self.portfolio_id).select_related('coin')]
+        changed = self.valuation.set_positions(positions)
+
+        missing = self.valuation.missing_prices()
+        if missing:
+            changed |= self.valuation.set_prices(await get_coingecko_service().aget_prices(missing))
+        await self.send_delta(changed)
+
+    async def refresh_prices(self):
+        # Fresh upstream fetches arrive as price_tick events; this picks up
+        # prices other workers cached without a broadcast reaching us.
+        while True:
+            try:
+                await asyncio.sleep(REFRESH_INTERVAL)
+                open_ids = self.valuation.open_coin_ids()
+                if open_ids:
+                    prices = await get_coingecko_service().aget_prices(open_ids)
+                    await self.send_delta(self.valuation.set_prices(prices))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"🚨 Error in valuation refresh: {e}")
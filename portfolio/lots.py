@@ -0,0 +1,86 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+FIFO = 'fifo'
+AVERAGE = 'average'
+COST_BASIS_METHODS = [(FIFO, 'FIFO'), (AVERAGE, 'Average cost')]
+
+EPSILON = 1e-12  # Quantities below this are treated as fully closed
+
+
+@dataclass
+class LotState:
+    """
+    Running cost-basis state for one coin in one portfolio.
+
+    ``lots`` holds open ``[quantity, unit_price]`` pairs oldest first and is
+    only used by FIFO; average cost keeps a single pooled ``cost``.
+    """
+    quantity: float = 0.0
+    cost: float = 0.0
+    realized_pnl: float = 0.0
+    invested: float = 0.0
+    lots: List[List[float]] = field(default_factory=list)
+
+    @property
+    def average_price(self) -> float:
+        return self.cost / self.quantity if self.quantity > EPSILON else 0.0
+
+
+def _buy(state: LotState, amount: float, price: float, method: str):
+    state.quantity += amount
+    state.cost += amount * price
+    state.invested += amount * price
+    if method == FIFO:
+        state.lots.append([amount, price])
+
+
+def _sell(state: LotState, amount: float, price: float, method: str):
+    if amount > state.quantity + EPSILON:
+        logger.warning(f"⚠️ Selling {amount} with only {state.quantity} held; clamping")
+        amount = state.quantity
+    if amount <= 0:
+        return
+
+    if method == FIFO:
+        remaining = amount
+        released = 0.0
+        while remaining > EPSILON and state.lots:
+            lot = state.lots[0]
+            take = min(lot[0], remaining)
+            released += take * lot[1]
+            lot[0] -= take
+            remaining -= take
+            if lot[0] <= EPSILON:
+                state.lots.pop(0)
+    else:
+        released = amount * state.average_price
+
+    state.quantity -= amount
+    state.cost -= released
+    state.realized_pnl += amount * price - released
+
+    if state.quantity <= EPSILON:
+        state.quantity = 0.0
+        state.cost = 0.0
+        state.lots = []
+
+
+def apply_transaction(state: LotState, tx, method: str) -> LotState:
+    """Fold a single ledger entry into ``state`` in place."""
+    if tx.transaction_type == 'buy':
+        _buy(state, tx.amount, tx.price_usd, method)
+    elif tx.transaction_type == 'sell':
+        _sell(state, tx.amount, tx.price_usd, method)
+    return state
+
+
+def replay(transactions: Iterable, method: str) -> LotState:
+    """Build state from scratch; ``transactions`` must be in ledger order."""
+    state = LotState()
+    for tx in transactions:
+        apply_transaction(state, tx, method)
+    return state
@@ -0,0 +1,62 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from portfolio.alerts import ABOVE, BELOW, AlertEvaluator
+
+class Command(BaseCommand):
+    help = 'Benchmarks price-alert evaluation against a large in-memory alert index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alerts', type=int, default=1_000_000)
+        parser.add_argument('--coins', type=int, default=50)
+        parser.add_argument('--ticks', type=int, default=10_000)
+        parser.add_argument('--volatility', type=float, default=0.002, help='Relative stddev of each tick')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        coins = [f"coin-{i}" for i in range(options['coins'])]
+        base = {coin: rng.uniform(1, 100_000) for coin in coins}
+
+        rows = []
+        for alert_id in range(options['alerts']):
+            coin = rng.choice(coins)
+            threshold = base[coin] * rng.uniform(0.5, 1.5)
+            rows.append((alert_id, coin, ABOVE if threshold > base[coin] else BELOW, threshold))
+
+        evaluator = AlertEvaluator()
+        start = time.perf_counter()
+        evaluator.load(rows)
+        load_time = time.perf_counter() - start
+        self.stdout.write(f"Indexed {len(evaluator):,} alerts over {len(coins)} coins in {load_time:.2f}s")
+
+        for coin, price in base.items():
+            evaluator.on_price(coin, price)
+
+        prices = dict(base)
+        fired = 0
+        elapsed = 0.0
+        for _ in range(options['ticks']):
+            coin = rng.choice(coins)
+            prices[coin] *= 1 + rng.gauss(0, options['volatility'])
+            start = time.perf_counter()
+            fired += len(evaluator.on_price(coin, prices[coin]))
+            elapsed += time.perf_counter() - start
+
+        per_tick = elapsed / options['ticks'] * 1e6
+        self.stdout.write(
+            f"{options['ticks']:,} ticks: {per_tick:.1f}µs/tick, {fired:,} alerts fired, "
+            f"{len(evaluator):,} still active"
+        )
+
+        # Naive baseline: scan every alert for the ticked coin.
+        flat = [(coin, direction, threshold) for _, coin, direction, threshold in rows]
+        sample = min(options['ticks'], 100)
+        start = time.perf_counter()
+        for _ in range(sample):
+            coin = rng.choice(coins)
+            previous, current = prices[coin], prices[coin] * (1 + rng.gauss(0, options['volatility']))
+            lo, hi = min(previous, current), max(previous, current)
+            sum(1 for c, _, t in flat if c == coin and lo < t <= hi)
+        naive = (time.perf_counter() - start) / sample * 1e6
+        self.stdout.write(self.style.SUCCESS(f"Linear scan baseline: {naive:.1f}µs/tick ({naive / per_tick:.0f}x slower)"))
@@ -0,0 +1,107 @@
+import json
+import pickle
+import random
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from portfolio import cache_codec
+
+ID_WORDS = ['bitcoin', 'ethereum', 'solana', 'cardano', 'the-open-network', 'shiba-inu', 'wrapped', 'staked']
+
+class Command(BaseCommand):
+    help = 'Compares pickled vs cache_codec entries for cached price and markets bodies (size and decode time).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coins', type=int, nargs='+', default=[10, 100, 250])
+        parser.add_argument('--reads', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    # Bodies go through JSON like real upstream responses, so pickle sees the
+    # same shared key strings it would in production.
+
+    def _prices(self, rng, n):
+        return {
+            f"{rng.choice(ID_WORDS)}-{rng.choice(ID_WORDS)}-{i}": {
+                'usd': rng.uniform(0.0001, 100_000),
+                'usd_24h_change': rng.gauss(0, 5),
+                'last_updated_at': 1_760_000_000 + rng.randrange(86_400),
+            }
+            for i in range(n)
+        }
+
+    def _markets(self, rng, n):
+        return [
+            {
+                'id': f"coin-{i}",
+                'symbol': f"c{i}",
+                'name': f"Coin {i}",
+                'image': f"https://assets.coingecko.com/coins/images/{i}/large/coin-{i}.png",
+                'current_price': rng.uniform(0.0001, 100_000),
+                'market_cap': rng.randrange(10 ** 12),
+                'market_cap_rank': i + 1,
+                'total_volume': rng.randrange(10 ** 10),
+                'high_24h': rng.uniform(0.0001, 100_000),
+                'low_24h': rng.uniform(0.0001, 100_000),
+                'price_change_percentage_24h': rng.gauss(0, 5),
+                'circulating_supply': rng.uniform(0, 10 ** 10),
+                'ath': rng.uniform(0.0001, 100_000),
+                'ath_date': f"2024-03-{rng.randrange(10, 28)}T07:10:36.635Z",
+                'roi': None if i % 3 else {'times': rng.random(), 'currency': 'usd', 'percentage': rng.random() * 100},
+                'last_updated': f"2025-10-09T12:{rng.randrange(10, 60)}:00.000Z",
+            }
+            for i in range(n)
+        ]
+
+    def _per_read(self, fn, data, reads, rounds=5):
+        """Best-of-``rounds`` µs per call."""
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(reads // rounds):
+                fn(data)
+            best = min(best, (time.perf_counter() - start) / (reads // rounds))
+        return best * 1e6
+
+    def _redis_bytes(self, client, key, value):
+        cache.set(key, value, timeout=60)
+        try:
+            return client.memory_usage(cache.make_and_validate_key(key))
+        finally:
+            cache.delete(key)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        reads = options['reads']
+
+        client = None
+        try:
+            from django_redis import get_redis_connection
+            client = get_redis_connection('default')
+            client.ping()
+        except Exception:
+            client = None
+            self.stdout.write("Default cache is not a reachable Redis; reporting payload sizes only.")
+
+        for n in options['coins']:
+            for kind, body in (('prices', self._prices(rng, n)), ('markets', self._markets(rng, n))):
+                body = json.loads(json.dumps(body))
+                pickled = pickle.dumps(body, pickle.HIGHEST_PROTOCOL)
+                encoded = cache_codec.encode(body)
+                assert cache_codec.decode(encoded) == body
+
+                pickle_us = self._per_read(pickle.loads, pickled, reads)
+                codec_us = self._per_read(cache_codec.decode, encoded, reads)
+                # Later reads of an unchanged entry: Redis hands back fresh bytes each time.
+                repeat_us = self._per_read(
+                    lambda data: cache_codec.decode_cached('bench_cache', bytes(data)), encoded, reads
+                )
+                line = (
+                    f"{kind:<7} {n:>4} coins: {len(pickled):>7,} -> {len(encoded):>7,} bytes "
+                    f"({len(encoded) / len(pickled):.0%}), decode {pickle_us:.1f} -> {codec_us:.1f}µs/read "
+                    f"({repeat_us:.1f}µs repeated)"
+                )
+                if client is not None:
+                    before = self._redis_bytes(client, 'bench_cache:pickle', body)
+                    after = self._redis_bytes(client, 'bench_cache:codec', encoded)
+                    line += f", Redis {before:,} -> {after:,} bytes"
+                self.stdout.write(line)
@@ -0,0 +1,49 @@
+import os
+import statistics
+import subprocess
+import sys
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so nothing is already imported.
+PROBE = """
+import time
+start = time.perf_counter()
+import {module}
+boot = time.perf_counter() - start
+{first_use}
+print(boot, time.perf_counter() - start)
+"""
+
+TARGETS = {
+    'asgi': ('crypto_backend.asgi', 'from django.urls import get_resolver; get_resolver().url_patterns'),
+    'wsgi': ('crypto_backend.wsgi', 'from django.urls import get_resolver; get_resolver().url_patterns'),
+}
+
+class Command(BaseCommand):
+    help = 'Measures cold worker boot time and time until routes are importable.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--target', choices=list(TARGETS), action='append')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+
+        for target in options['target'] or list(TARGETS):
+            module, first_use = TARGETS[target]
+            code = PROBE.format(module=module, first_use=first_use)
+            boots, ready = [], []
+            for _ in range(options['runs']):
+                out = subprocess.run(
+                    [sys.executable, '-c', code], env=env,
+                    capture_output=True, text=True, check=True,
+                ).stdout.split()
+                boots.append(float(out[-2]) * 1000)
+                ready.append(float(out[-1]) * 1000)
+
+            self.stdout.write(
+                f"{target}: boot {statistics.median(boots):.0f}ms, "
+                f"routes loaded {statistics.median(ready):.0f}ms "
+                f"(median of {options['runs']})"
+            )
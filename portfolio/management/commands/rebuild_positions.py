@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from portfolio.models import Portfolio
+from portfolio.positions import rebuild_positions
+
+class Command(BaseCommand):
+    help = 'Replays transaction ledgers to rebuild cost-basis positions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('portfolio_ids', nargs='*', type=int, help='Limit to these portfolios')
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.all()
+        if options['portfolio_ids']:
+            portfolios = portfolios.filter(id__in=options['portfolio_ids'])
+
+        for portfolio in portfolios:
+            positions = rebuild_positions(portfolio)
+            self.stdout.write(f"{portfolio.name}: {len(positions)} positions")
+
+        self.stdout.write(self.style.SUCCESS("Positions rebuilt."))
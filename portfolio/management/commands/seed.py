@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from portfolio.models import Portfolio, Transaction
+from portfolio.models import Coin, Portfolio, Transaction
+from portfolio.positions import rebuild_positions
 
 class Command(BaseCommand):
     help = 'Wipes and seeds the database with sample portfolios and transactions.'
@@ -14,15 +15,31 @@ class Command(BaseCommand):
         p1 = Portfolio.objects.create(name="Jose's Portfolio")
         p2 = Portfolio.objects.create(name="Sample Portfolio")
 
+        coins = {}
+        for coingecko_id, name, symbol in [
+            ("bitcoin", "Bitcoin", "BTC"),
+            ("ethereum", "Ethereum", "ETH"),
+            ("cardano", "Cardano", "ADA"),
+            ("solana", "Solana", "SOL"),
+            ("dogecoin", "Dogecoin", "DOGE"),
+        ]:
+            coins[coingecko_id], _ = Coin.objects.get_or_create(
+                coingecko_id=coingecko_id, defaults={'name': name, 'symbol': symbol}
+            )
+
         Transaction.objects.bulk_create([
-            Transaction(portfolio=p1, coin_id="bitcoin", coin_name="Bitcoin", coin_symbol="BTC", amount=0.01, price_usd=50000, transaction_type="buy"),
-            Transaction(portfolio=p1, coin_id="ethereum", coin_name="Ethereum", coin_symbol="ETH", amount=0.5, price_usd=2000, transaction_type="buy"),
-            Transaction(portfolio=p1, coin_id="cardano", coin_name="Cardano", coin_symbol="ADA", amount=100, price_usd=1.5, transaction_type="buy"),
-            Transaction(portfolio=p1, coin_id="bitcoin", coin_name="Bitcoin", coin_symbol="BTC", amount=0.005, price_usd=52000, transaction_type="sell"),
-
-            Transaction(portfolio=p2, coin_id="solana", coin_name="Solana", coin_symbol="SOL", amount=2, price_usd=100, transaction_type="buy"),
-            Transaction(portfolio=p2, coin_id="ethereum", coin_name="Ethereum", coin_symbol="ETH", amount=0.2, price_usd=2100, transaction_type="buy"),
-            Transaction(portfolio=p2, coin_id="dogecoin", coin_name="Dogecoin", coin_symbol="DOGE", amount=500, price_usd=0.08, transaction_type="buy"),
+            Transaction(portfolio=p1, coin=coins["bitcoin"], amount=0.01, price_usd=50000, transaction_type="buy"),
+            Transaction(portfolio=p1, coin=coins["ethereum"], amount=0.5, price_usd=2000, transaction_type="buy"),
+            Transaction(portfolio=p1, coin=coins["cardano"], amount=100, price_usd=1.5, transaction_type="buy"),
+            Transaction(portfolio=p1, coin=coins["bitcoin"], amount=0.005, price_usd=52000, transaction_type="sell"),
+
+            Transaction(portfolio=p2, coin=coins["solana"], amount=2, price_usd=100, transaction_type="buy"),
+            Transaction(portfolio=p2, coin=coins["ethereum"], amount=0.2, price_usd=2100, transaction_type="buy"),
+            Transaction(portfolio=p2, coin=coins["dogecoin"], amount=500, price_usd=0.08, transaction_type="buy"),
         ])
 
+        # bulk_create skips the post_save signals that maintain positions.
+        for portfolio in (p1, p2):
+            rebuild_positions(portfolio)
+
         self.stdout.write(self.style.SUCCESS("Database seeded successfully."))
\ No newline at end of file
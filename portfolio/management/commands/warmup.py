@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from portfolio.warmup import warm_up
+
+class Command(BaseCommand):
+    help = 'Pre-connects DB, cache and HTTP pools and primes hot price keys.'
+
+    def handle(self, *args, **kwargs):
+        for step, result in warm_up().items():
+            status = 'ok' if result['ok'] else 'failed (see log)'
+            self.stdout.write(f"{step:<10} {result['ms']:>8.1f}ms  {status}")
+
+        self.stdout.write(self.style.SUCCESS("Warm-up complete."))
@@ -0,0 +1,31 @@
+import time
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+from portfolio.alerts import alert_service
+from portfolio.coingecko import get_coingecko_service
+from portfolio.consumers import REFRESH_INTERVAL
+
+class Command(BaseCommand):
+    help = 'Periodically fetches prices for every coin with an active alert so alerts fire even when nobody requests those coins.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=REFRESH_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+
+    def handle(self, *args, **options):
+        channel_layer = get_channel_layer()
+        if channel_layer is None or isinstance(channel_layer, InMemoryChannelLayer):
+            # Alerts fired here would be marked triggered but reach no socket.
+            raise CommandError("watch_alerts needs a cross-process CHANNEL_LAYERS backend (e.g. RedisChannelLayer)")
+
+        service = get_coingecko_service()
+        while True:
+            coin_ids = alert_service.watched_coin_ids()
+            if coin_ids:
+                # Fresh fetches are evaluated inside get_prices; this also covers
+                # cache hits, which are no-ops for prices already seen.
+                alert_service.process_tick(service.get_prices(coin_ids))
+            self.stdout.write(f"Checked {len(coin_ids)} coins with active alerts")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+EPSILON = 1e-12
+
+
+def replay(txs, method):
+    """
+    Cost-basis replay as of this migration, frozen here so later changes to
+    ``portfolio.lots`` can't change what the migration produces.
+    """
+    quantity = cost = realized_pnl = invested = 0.0
+    lots = []
+    for tx in txs:
+        amount, price = tx.amount, tx.price_usd
+        if tx.transaction_type == 'buy':
+            quantity += amount
+            cost += amount * price
+            invested += amount * price
+            if method == 'fifo':
+                lots.append([amount, price])
+        elif tx.transaction_type == 'sell':
+            if amount > quantity + EPSILON:
+                amount = quantity
+            if amount <= 0:
+                continue
+            if method == 'fifo':
+                remaining, released = amount, 0.0
+                while remaining > EPSILON and lots:
+                    lot = lots[0]
+                    take = min(lot[0], remaining)
+                    released += take * lot[1]
+                    lot[0] -= take
+                    remaining -= take
+                    if lot[0] <= EPSILON:
+                        lots.pop(0)
+            else:
+                released = amount * (cost / quantity if quantity > EPSILON else 0.0)
+            quantity -= amount
+            cost -= released
+            realized_pnl += amount * price - released
+            if quantity <= EPSILON:
+                quantity, cost, lots = 0.0, 0.0, []
+    return {
+        'quantity': quantity,
+        'cost': cost,
+        'realized_pnl': realized_pnl,
+        'invested': invested,
+        'lots': lots,
+    }
+
+
+def build_positions(apps, schema_editor):
+    Portfolio = apps.get_model('portfolio', 'Portfolio')
+    Transaction = apps.get_model('portfolio', 'Transaction')
+    Position = apps.get_model('portfolio', 'Position')
+
+    for portfolio in Portfolio.objects.all():
+        ledgers = {}
+        for tx in Transaction.objects.filter(portfolio=portfolio).order_by('timestamp', 'id'):
+            ledgers.setdefault(tx.coin_id, []).append(tx)
+
+        for coin_id, txs in ledgers.items():
+            state = replay(txs, portfolio.cost_basis_method)
+            Position.objects.create(
+                portfolio=portfolio,
+                coin_id=coin_id,
+                coin_name=txs[-1].coin_name,
+                coin_symbol=txs[-1].coin_symbol,
+                **state,
+                last_timestamp=txs[-1].timestamp,
+                last_transaction_id=txs[-1].id,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='cost_basis_method',
+            field=models.CharField(choices=[('fifo', 'FIFO'), ('average', 'Average cost')], default='fifo', max_length=7),
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin_id', models.CharField(max_length=50)),
+                ('coin_name', models.CharField(max_length=50)),
+                ('coin_symbol', models.CharField(max_length=10)),
+                ('quantity', models.FloatField(default=0)),
+                ('cost', models.FloatField(default=0)),
+                ('realized_pnl', models.FloatField(default=0)),
+                ('invested', models.FloatField(default=0)),
+                ('lots', models.JSONField(default=list)),
+                ('last_timestamp', models.DateTimeField(null=True)),
+                ('last_transaction_id', models.BigIntegerField(null=True)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='portfolio.portfolio')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('portfolio', 'coin_id'), name='unique_position_per_coin')],
+            },
+        ),
+        migrations.RunPython(build_positions, migrations.RunPython.noop),
+    ]
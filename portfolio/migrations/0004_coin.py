@@ -0,0 +1,138 @@
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def merge_positions(apps, coin_pk):
+    """Replace a portfolio's positions for ``coin_pk`` with one replayed from the merged ledger."""
+    Portfolio = apps.get_model('portfolio', 'Portfolio')
+    Transaction = apps.get_model('portfolio', 'Transaction')
+    Position = apps.get_model('portfolio', 'Position')
+    replay = import_module('portfolio.migrations.0002_positions').replay
+
+    duplicated = (
+        Position.objects.filter(coin_id=coin_pk).values('portfolio_id')
+        .annotate(n=models.Count('id')).filter(n__gt=1).values_list('portfolio_id', flat=True)
+    )
+    for portfolio in Portfolio.objects.filter(id__in=list(duplicated)):
+        txs = list(Transaction.objects.filter(portfolio=portfolio, coin_id=coin_pk).order_by('timestamp', 'id'))
+        Position.objects.filter(portfolio=portfolio, coin_id=coin_pk).delete()
+        if txs:
+            Position.objects.create(
+                portfolio=portfolio,
+                coin_id=coin_pk,
+                **replay(txs, portfolio.cost_basis_method),
+                last_timestamp=txs[-1].timestamp,
+                last_transaction_id=txs[-1].id,
+            )
+
+
+def forwards(apps, schema_editor):
+    Coin = apps.get_model('portfolio', 'Coin')
+    Transaction = apps.get_model('portfolio', 'Transaction')
+    Position = apps.get_model('portfolio', 'Position')
+
+    # CoinGecko ids are lowercase; legacy rows that differ only in case are
+    # the same coin.
+    coins = {}
+    variants = {}
+    # Latest transaction wins for name / symbol.
+    for tx in Transaction.objects.order_by('timestamp', 'id').iterator():
+        coingecko_id = tx.legacy_coin_id.lower()
+        coins[coingecko_id] = (tx.legacy_coin_name, tx.legacy_coin_symbol)
+        variants.setdefault(coingecko_id, set()).add(tx.legacy_coin_id)
+    for pos in Position.objects.iterator():
+        coingecko_id = pos.legacy_coin_id.lower()
+        coins.setdefault(coingecko_id, (pos.legacy_coin_name, pos.legacy_coin_symbol))
+        variants.setdefault(coingecko_id, set()).add(pos.legacy_coin_id)
+
+    for coingecko_id, (name, symbol) in coins.items():
+        pk = Coin.objects.create(coingecko_id=coingecko_id, name=name, symbol=symbol).pk
+        legacy_ids = variants[coingecko_id]
+        Transaction.objects.filter(legacy_coin_id__in=legacy_ids).update(coin_id=pk)
+        Position.objects.filter(legacy_coin_id__in=legacy_ids).update(coin_id=pk)
+        if len(legacy_ids) > 1:
+            merge_positions(apps, pk)
+
+
+def backwards(apps, schema_editor):
+    Coin = apps.get_model('portfolio', 'Coin')
+    Transaction = apps.get_model('portfolio', 'Transaction')
+    Position = apps.get_model('portfolio', 'Position')
+
+    for coin in Coin.objects.all():
+        legacy = {'legacy_coin_id': coin.coingecko_id, 'legacy_coin_name': coin.name, 'legacy_coin_symbol': coin.symbol}
+        Transaction.objects.filter(coin_id=coin.pk).update(**legacy)
+        Position.objects.filter(coin_id=coin.pk).update(**legacy)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_price_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Coin',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('coingecko_id', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=50)),
+                ('symbol', models.CharField(max_length=10)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='position',
+            name='unique_position_per_coin',
+        ),
+        # Move the varchar columns aside: the new FK's column is also ``coin_id``.
+        migrations.RenameField(model_name='transaction', old_name='coin_id', new_name='legacy_coin_id'),
+        migrations.RenameField(model_name='transaction', old_name='coin_name', new_name='legacy_coin_name'),
+        migrations.RenameField(model_name='transaction', old_name='coin_symbol', new_name='legacy_coin_symbol'),
+        migrations.RenameField(model_name='position', old_name='coin_id', new_name='legacy_coin_id'),
+        migrations.RenameField(model_name='position', old_name='coin_name', new_name='legacy_coin_name'),
+        migrations.RenameField(model_name='position', old_name='coin_symbol', new_name='legacy_coin_symbol'),
+    ] + [
+        # Nullable so a reverse migration can re-add them before backfilling.
+        migrations.AlterField(model_name=model, name=name, field=models.CharField(max_length=length, null=True))
+        for model in ('transaction', 'position')
+        for name, length in (('legacy_coin_id', 50), ('legacy_coin_name', 50), ('legacy_coin_symbol', 10))
+    ] + [
+        migrations.AddField(
+            model_name='transaction',
+            name='coin',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='portfolio.coin'),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='coin',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='positions', to='portfolio.coin'),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(model_name='transaction', name='legacy_coin_id'),
+        migrations.RemoveField(model_name='transaction', name='legacy_coin_name'),
+        migrations.RemoveField(model_name='transaction', name='legacy_coin_symbol'),
+        migrations.RemoveField(model_name='position', name='legacy_coin_id'),
+        migrations.RemoveField(model_name='position', name='legacy_coin_name'),
+        migrations.RemoveField(model_name='position', name='legacy_coin_symbol'),
+        migrations.AlterField(
+            model_name='transaction',
+            name='coin',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='portfolio.coin'),
+        ),
+        migrations.AlterField(
+            model_name='position',
+            name='coin',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='positions', to='portfolio.coin'),
+        ),
+        migrations.AddConstraint(
+            model_name='position',
+            constraint=models.UniqueConstraint(fields=('portfolio', 'coin'), name='unique_position_per_coin'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['portfolio', 'coin', 'timestamp'], name='transaction_ledger_idx'),
+        ),
+    ]
@@ -1,21 +1,98 @@
 from django.db import models
+from .alerts import ALERT_DIRECTIONS
+from .lots import COST_BASIS_METHODS, FIFO, LotState
 
 class Portfolio(models.Model):
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    cost_basis_method = models.CharField(max_length=7, choices=COST_BASIS_METHODS, default=FIFO)
+
+    def __str__(self):
+        return self.name
+
+class Coin(models.Model):
+    """Reference data for a CoinGecko asset, shared by every ledger row."""
+    id = models.AutoField(primary_key=True)  # 4-byte key keeps ledger rows and indexes narrow
+    coingecko_id = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=50)
+    symbol = models.CharField(max_length=10)
 
     def __str__(self):
         return self.name
 
 class Transaction(models.Model):
     portfolio = models.ForeignKey(Portfolio, related_name='transactions', on_delete=models.CASCADE)
-    coin_id = models.CharField(max_length=50)
-    coin_name = models.CharField(max_length=50)
-    coin_symbol = models.CharField(max_length=10)
+    coin = models.ForeignKey(Coin, related_name='transactions', on_delete=models.PROTECT)
     amount = models.FloatField()
     price_usd = models.FloatField()
     transaction_type = models.CharField(max_length=4, choices=[('buy', 'Buy'), ('sell', 'Sell')])
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['portfolio', 'coin', 'timestamp'], name='transaction_ledger_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type.upper()} {self.amount} {self.coin.symbol}"
+
+class Position(models.Model):
+    """Persisted cost-basis state per portfolio and coin, maintained from the ledger."""
+    portfolio = models.ForeignKey(Portfolio, related_name='positions', on_delete=models.CASCADE)
+    coin = models.ForeignKey(Coin, related_name='positions', on_delete=models.PROTECT)
+    quantity = models.FloatField(default=0)
+    cost = models.FloatField(default=0)
+    realized_pnl = models.FloatField(default=0)
+    invested = models.FloatField(default=0)
+    lots = models.JSONField(default=list)
+    last_timestamp = models.DateTimeField(null=True)
+    last_transaction_id = models.BigIntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['portfolio', 'coin'], name='unique_position_per_coin'),
+        ]
+
     def __str__(self):
-        return f"{self.transaction_type.upper()} {self.amount} {self.coin_symbol}"
+        return f"{self.quantity} {self.coin.symbol} @ {self.portfolio_id}"
+
+    def to_state(self):
+        return LotState(
+            quantity=self.quantity,
+            cost=self.cost,
+            realized_pnl=self.realized_pnl,
+            invested=self.invested,
+            lots=[list(lot) for lot in self.lots],
+        )
+
+    def load_state(self, state):
+        self.quantity = state.quantity
+        self.cost = state.cost
+        self.realized_pnl = state.realized_pnl
+        self.invested = state.invested
+        self.lots = state.lots
+
+class PriceAlert(models.Model):
+    """One-shot notification when a coin's price crosses ``threshold``."""
+    portfolio = models.ForeignKey(Portfolio, related_name='alerts', on_delete=models.CASCADE)
+    coin_id = models.CharField(max_length=50)
+    direction = models.CharField(max_length=5, choices=ALERT_DIRECTIONS)
+    threshold = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+    triggered_price = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.coin_id} {self.direction} {self.threshold}"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'portfolio_id': self.portfolio_id,
+            'coin_id': self.coin_id,
+            'direction': self.direction,
+            'threshold': self.threshold,
+            'created_at': self.created_at.isoformat(),
+            'triggered_at': self.triggered_at.isoformat() if self.triggered_at else None,
+            'triggered_price': self.triggered_price,
+        }
@@ -0,0 +1,73 @@
+import logging
+from django.db import transaction as db_transaction
+from .lots import apply_transaction, replay
+from .models import Position, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _ledger(portfolio_id, coin_id):
+    return Transaction.objects.filter(portfolio_id=portfolio_id, coin_id=coin_id).order_by('timestamp', 'id')
+
+
+def rebuild_position(portfolio, coin_id):
+    """
+    Replay the full ledger for one coin. Used for back-dated edits and deletes.
+
+    ``coin_id`` is the ``Coin`` primary key, not the CoinGecko id.
+    """
+    txs = list(_ledger(portfolio.id, coin_id))
+    if not txs:
+        Position.objects.filter(portfolio=portfolio, coin_id=coin_id).delete()
+        return None
+
+    state = replay(txs, portfolio.cost_basis_method)
+    last = txs[-1]
+    position, _ = Position.objects.update_or_create(
+        portfolio=portfolio,
+        coin_id=coin_id,
+        defaults={
+            'quantity': state.quantity,
+            'cost': state.cost,
+            'realized_pnl': state.realized_pnl,
+            'invested': state.invested,
+            'lots': state.lots,
+            'last_timestamp': last.timestamp,
+            'last_transaction_id': last.id,
+        },
+    )
+    logger.info(f"♻️ Rebuilt position {portfolio.id}/{coin_id} from {len(txs)} transactions")
+    return position
+
+
+def rebuild_positions(portfolio):
+    Position.objects.filter(portfolio=portfolio).delete()
+    coin_ids = portfolio.transactions.values_list('coin_id', flat=True).distinct()
+    return [rebuild_position(portfolio, coin_id) for coin_id in coin_ids]
+
+
+def record_transaction(tx):
+    """Fold a newly appended transaction into its position without replaying history."""
+    portfolio = tx.portfolio
+    with db_transaction.atomic():
+        position, created = Position.objects.select_for_update().get_or_create(
+            portfolio=portfolio,
+            coin_id=tx.coin_id,
+        )
+
+        if created:
+            stale = _ledger(portfolio.id, tx.coin_id).exclude(id=tx.id).exists()
+        else:
+            stale = (
+                position.last_timestamp is not None
+                and (tx.timestamp, tx.id) < (position.last_timestamp, position.last_transaction_id)
+            )
+        if stale:
+            return rebuild_position(portfolio, tx.coin_id)
+
+        state = apply_transaction(position.to_state(), tx, portfolio.cost_basis_method)
+        position.load_state(state)
+        position.last_timestamp = tx.timestamp
+        position.last_transaction_id = tx.id
+        position.save()
+        return position
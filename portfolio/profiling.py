@@ -0,0 +1,375 @@
+import asyncio
+import contextvars
+import cProfile
+import io
+import itertools
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERIES = 200       # SQL statements kept per report
+TOP_FUNCTIONS = 40      # pstats rows kept per report
+TOP_STACKS = 25         # Sampled stacks kept per report
+STACK_DEPTH = 30
+
+_current = contextvars.ContextVar('profile_session', default=None)
+_ids = itertools.count(1)
+_reports = None
+_reports_lock = threading.Lock()
+# Threads with an enabled cProfile. Before 3.12 a second enable() on the same
+# thread silently replaces the first, so at most one deep session per thread.
+_deep_threads = set()
+_deep_lock = threading.Lock()
+
+
+def _buffer():
+    global _reports
+    if _reports is None:
+        _reports = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+    return _reports
+
+
+def get_reports():
+    """Stored reports, newest first."""
+    with _reports_lock:
+        return list(reversed(_buffer()))
+
+
+def get_report(report_id):
+    with _reports_lock:
+        return next((r for r in _buffer() if r['id'] == report_id), None)
+
+
+def _store(report):
+    with _reports_lock:
+        _buffer().append(report)
+    logger.info(f"🩺 Stored profile #{report['id']} for {report['name']} ({report['duration_ms']}ms)")
+
+
+class StackSampler:
+    """
+    One background thread that samples the Python stacks of every thread
+    with an active session; cheap enough for threshold mode.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._watches = []   # (thread id, Counter of stacks) per session
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def watch(self, thread_id):
+        """Start collecting ``thread_id``'s stacks into the returned Counter."""
+        stacks = Counter()
+        with self._lock:
+            self._watches.append((thread_id, stacks))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return stacks
+
+    def unwatch(self, stacks):
+        with self._lock:
+            self._watches = [w for w in self._watches if w[1] is not stacks]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._watches:
+                    self._wake.clear()
+            if not self._wake.is_set():
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._watches:
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None and len(stack) < STACK_DEPTH:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if stack:
+                        stacks[";".join(reversed(stack))] += 1
+
+
+_stack_sampler = None
+
+
+def _sampler():
+    global _stack_sampler
+    if _stack_sampler is None:
+        with _deep_lock:
+            if _stack_sampler is None:
+                _stack_sampler = StackSampler(settings.PROFILING_SAMPLER_INTERVAL)
+    return _stack_sampler
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class ProfileSession:
+    """
+    Collects SQL, named spans and a cProfile / stack profile for one request or tick.
+
+    A deep session gets cProfile only if no other deep session is active on
+    the same thread; otherwise it falls back to the stack sampler. Either
+    profiler sees a whole thread, so on the event loop the profile covers
+    every coroutine that ran meanwhile, and misses ORM work done in
+    ``sync_to_async`` threads (SQL is still recorded).
+    """
+
+    def __init__(self, kind, name, trigger, deep):
+        self.kind = kind
+        self.name = name
+        self.trigger = trigger
+        self.queries = []
+        self.query_count = 0
+        self.query_ms = 0.0
+        self.spans = {}
+        self._profiler = None
+        self._stacks = None
+        self._token = None
+        self._deep = deep
+        self._deep_thread = None
+        self._on_loop = False
+
+    def start(self):
+        self._token = _current.set(self)
+        self._on_loop = _on_event_loop()
+        if self._deep:
+            ident = threading.get_ident()
+            with _deep_lock:
+                if ident not in _deep_threads:
+                    _deep_threads.add(ident)
+                    self._deep_thread = ident
+        if self._deep_thread is not None:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Some other profiler (3.12+) already owns this thread.
+                self._profiler = None
+                self._release_thread()
+        if self._profiler is None:
+            self._stacks = _sampler().watch(threading.get_ident())
+        self._started = time.perf_counter()
+
+    def _release_thread(self):
+        if self._deep_thread is not None:
+            with _deep_lock:
+                _deep_threads.discard(self._deep_thread)
+            self._deep_thread = None
+
+    def stop(self):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if self._profiler:
+            self._profiler.disable()
+            self._release_thread()
+        if self._stacks is not None:
+            _sampler().unwatch(self._stacks)
+        _current.reset(self._token)
+
+    def record_query(self, sql, ms):
+        self.query_count += 1
+        self.query_ms += ms
+        if len(self.queries) < MAX_QUERIES:
+            self.queries.append({'sql': sql, 'ms': round(ms, 3)})
+
+    def record_span(self, name, ms):
+        self.spans.setdefault(name, []).append(round(ms, 3))
+
+    def report(self, **extra):
+        report = {
+            'id': next(_ids),
+            'kind': self.kind,
+            'name': self.name,
+            'trigger': self.trigger,
+            'created_at': time.time(),
+            'duration_ms': round(self.duration_ms, 3),
+            'sql': {
+                'count': self.query_count,
+                'total_ms': round(self.query_ms, 3),
+                'queries': self.queries,
+            },
+            'spans': {
+                name: {'count': len(times), 'total_ms': round(sum(times), 3), 'calls_ms': times}
+                for name, times in self.spans.items()
+            },
+            **extra,
+        }
+        if self._on_loop:
+            report['scope'] = 'event_loop'   # includes other coroutines; excludes sync_to_async threads
+        if self._profiler:
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            report['profile'] = {'type': 'cprofile', 'stats': out.getvalue()}
+        elif self._stacks is not None:
+            report['profile'] = {
+                'type': 'stack_sampler',
+                'interval_ms': settings.PROFILING_SAMPLER_INTERVAL * 1000,
+                'stacks': [{'stack': stack, 'samples': n} for stack, n in self._stacks.most_common(TOP_STACKS)],
+            }
+        return report
+
+
+def _trigger(header_value=None):
+    """Decide whether to profile: returns ``(trigger, deep)`` or ``None``."""
+    token = settings.PROFILING_TOKEN
+    if token and header_value == token:
+        return 'header', True
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sample', True
+    if settings.PROFILING_SLOW_MS:
+        return 'threshold', False
+    return None
+
+
+def _keep(session):
+    return session.trigger != 'threshold' or session.duration_ms >= settings.PROFILING_SLOW_MS
+
+
+# ---- hooks used by the rest of the app -----------------------------------
+
+@contextmanager
+def span(name):
+    """Time a block into the active profile, if any. Near-free when profiling is off."""
+    session = _current.get()
+    if session is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.record_span(name, (time.perf_counter() - start) * 1000)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    session = _current.get()
+    if session is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        session.record_query(sql, (time.perf_counter() - start) * 1000)
+
+
+def install_sql_hook(sender, connection, **kwargs):
+    """``connection_created`` receiver: route every query through ``_sql_wrapper``."""
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+# ---- request middleware --------------------------------------------------
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiling (``PROFILING_ENABLED``).
+
+    A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>``,
+    is picked by ``PROFILING_SAMPLE_RATE``, or - with ``PROFILING_SLOW_MS``
+    set - takes longer than that (stack-sampled, stored only if slow).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _session(self, request):
+        decision = _trigger(request.headers.get('X-Profile'))
+        if decision is None:
+            return None
+        trigger, deep = decision
+        return ProfileSession('request', f"{request.method} {request.path}", trigger, deep)
+
+    def _finish(self, session, response):
+        if _keep(session):
+            report = session.report(status=getattr(response, 'status_code', None))
+            _store(report)
+            response['X-Profile-Id'] = str(report['id'])
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        session = self._session(request)
+        if session is None:
+            return self.get_response(request)
+        session.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            session.stop()
+        self._finish(session, response)
+        return response
+
+    async def __acall__(self, request):
+        session = self._session(request)
+        if session is None:
+            return await self.get_response(request)
+        session.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            # Also runs when the ASGI handler cancels the view on disconnect.
+            session.stop()
+        self._finish(session, response)
+        return response
+
+
+# ---- consumer wrappers ---------------------------------------------------
+
+@asynccontextmanager
+async def profile_tick(name):
+    """Profile one websocket loop iteration under the sampling / threshold rules."""
+    decision = _trigger() if settings.PROFILING_ENABLED else None
+    if decision is None:
+        yield
+        return
+    trigger, deep = decision
+    session = ProfileSession('consumer', name, trigger, deep)
+    session.start()
+    try:
+        yield
+    finally:
+        session.stop()
+        if _keep(session):
+            _store(session.report())
+
+
+def profiled(name):
+    """Decorator form of ``profile_tick`` for consumer handlers."""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            async with profile_tick(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -15,6 +15,8 @@ class PortfolioMetrics:
     total_cost: float
     total_profit_loss: float
     profit_loss_percentage: float
+    realized_profit_loss: float
+    unrealized_profit_loss: float
     best_performer: Optional[Performer]
     worst_performer: Optional[Performer]
     asset_allocation: Dict[str, float]
\ No newline at end of file
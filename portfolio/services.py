@@ -1,67 +1,100 @@
-from .coingecko import coingecko_service
+from asgiref.sync import sync_to_async
+from .coingecko import get_coingecko_service
+from .lots import EPSILON
 from .schemas import PortfolioMetrics, Performer
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 class PortfolioAnalytics:
-    def __init__(self):
-        self.price_service = coingecko_service
-
-    def calculate_portfolio_metrics(self, portfolio):
-        from .models import Portfolio, Transaction 
-
-        transactions = portfolio.transactions.all()
-        logger.info(f"🧠 Portfolio: {portfolio.name} ({portfolio.id}) - {transactions.count()} transactions")
-
-        if not transactions.exists():
-            return PortfolioMetrics(
-                total_value=0,
-                total_cost=0,
-                total_profit_loss=0,
-                profit_loss_percentage=0,
-                best_performer=None,
-                worst_performer=None,
-                asset_allocation={}
-            )
+    @property
+    def price_service(self):
+        return get_coingecko_service()
+
+    @staticmethod
+    def _empty_metrics():
+        return PortfolioMetrics(
+            total_value=0,
+            total_cost=0,
+            total_profit_loss=0,
+            profit_loss_percentage=0,
+            realized_profit_loss=0,
+            unrealized_profit_loss=0,
+            best_performer=None,
+            worst_performer=None,
+            asset_allocation={}
+        )
+
+    @staticmethod
+    def _open_coin_ids(positions):
+        return sorted(set(p.coin.coingecko_id.lower() for p in positions if p.quantity > EPSILON))
+
+    @staticmethod
+    def load_positions(portfolio):
+        from .positions import rebuild_positions
+
+        positions = list(portfolio.positions.select_related('coin'))
+        # Ledgers written with bulk_create never went through the signals.
+        if not positions and portfolio.transactions.exists():
+            rebuild_positions(portfolio)
+            positions = list(portfolio.positions.select_related('coin'))
+        return positions
 
-        coin_ids = list(set(tx.coin_id.lower() for tx in transactions))
-        prices = self.price_service.get_prices(coin_ids)
+    def calculate_portfolio_metrics(self, portfolio, positions=None):
+        if positions is None:
+            positions = self.load_positions(portfolio)
+        logger.info(f"🧠 Portfolio: {portfolio.name} ({portfolio.id}) - {len(positions)} positions")
+
+        if not positions:
+            return self._empty_metrics()
+
+        coin_ids = self._open_coin_ids(positions)
+        prices = self.price_service.get_prices(coin_ids) if coin_ids else {}
         logger.info(f"🔍 CoinGecko prices fetched:\n{prices}")
+        return self.build_metrics(positions, prices)
 
-        if not prices:
-            return PortfolioMetrics(
-                total_value=0,
-                total_cost=0,
-                total_profit_loss=0,
-                profit_loss_percentage=0,
-                best_performer=None,
-                worst_performer=None,
-                asset_allocation={}
-            )
+    async def acalculate_portfolio_metrics(self, portfolio, positions=None):
+        if positions is None:
+            positions = await sync_to_async(self.load_positions)(portfolio)
+        logger.info(f"🧠 Portfolio: {portfolio.name} ({portfolio.id}) - {len(positions)} positions")
 
-        performance = {}
+        if not positions:
+            return self._empty_metrics()
 
-        for tx in transactions:
-            current_price = prices.get(tx.coin_id.lower(), {}).get("usd", 0)
-            value = tx.amount * current_price
-            cost = tx.amount * tx.price_usd
+        coin_ids = self._open_coin_ids(positions)
+        prices = await self.price_service.aget_prices(coin_ids) if coin_ids else {}
+        logger.info(f"🔍 CoinGecko prices fetched:\n{prices}")
+        return self.build_metrics(positions, prices)
+
+    def build_metrics(self, positions, prices):
+        if self._open_coin_ids(positions) and not prices:
+            return self._empty_metrics()
 
-            if tx.coin_id not in performance:
-                performance[tx.coin_id] = {
-                    "cost": 0,
-                    "value": 0,
-                    "name": tx.coin_name,
-                    "symbol": tx.coin_symbol
-                }
+        performance = {}
 
-            performance[tx.coin_id]["cost"] += cost
-            performance[tx.coin_id]["value"] += value
+        for p in positions:
+            current_price = prices.get(p.coin.coingecko_id.lower(), {}).get("usd", 0)
+            value = p.quantity * current_price
+
+            performance[p.coin.coingecko_id] = {
+                "cost": p.cost,
+                "value": value,
+                "realized": p.realized_pnl,
+                "unrealized": value - p.cost,
+                "invested": p.invested,
+                "open": p.quantity > EPSILON,
+                "name": p.coin.name,
+                "symbol": p.coin.symbol
+            }
 
         total_cost = sum(p["cost"] for p in performance.values())
         total_value = sum(p["value"] for p in performance.values())
-        profit_loss = total_value - total_cost
-        profit_loss_pct = (profit_loss / total_cost * 100) if total_cost else 0
+        realized = sum(p["realized"] for p in performance.values())
+        unrealized = total_value - total_cost
+        profit_loss = realized + unrealized
+        invested = sum(p["invested"] for p in performance.values())
+        profit_loss_pct = (profit_loss / invested * 100) if invested else 0
 
         best = None
         worst = None
@@ -69,11 +102,11 @@ class PortfolioAnalytics:
         worst_pct = float('inf')
 
         for coin_id, data in performance.items():
-            if data["cost"] == 0:
+            if data["invested"] == 0:
                 continue
 
-            profit = data["value"] - data["cost"]
-            pct = (profit / data["cost"]) * 100
+            profit = data["realized"] + data["unrealized"]
+            pct = (profit / data["invested"]) * 100
 
             performer = Performer(
                 coin_id=coin_id,
@@ -97,6 +130,7 @@ class PortfolioAnalytics:
         asset_allocation = {
             data["name"]: (data["value"] / total_value * 100 if total_value else 0)
             for data in performance.values()
+            if data["open"]
         }
 
         return PortfolioMetrics(
@@ -104,9 +138,21 @@ class PortfolioAnalytics:
             total_cost=total_cost,
             total_profit_loss=profit_loss,
             profit_loss_percentage=profit_loss_pct,
+            realized_profit_loss=realized,
+            unrealized_profit_loss=unrealized,
             best_performer=best,
             worst_performer=worst,
             asset_allocation=asset_allocation
         )
 
-portfolio_analytics = PortfolioAnalytics()
+_analytics = None
+_analytics_lock = threading.Lock()
+
+def get_portfolio_analytics() -> PortfolioAnalytics:
+    """Process-wide analytics service, constructed on first use."""
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                _analytics = PortfolioAnalytics()
+    return _analytics
@@ -1,3 +1,63 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .alerts import alert_service
+from .models import Portfolio, PriceAlert, Transaction
+from .positions import rebuild_position, record_transaction
+from .valuation import broadcast_ledger_change
+
+
+def _notify_ledger_change(portfolio_id):
+    db_transaction.on_commit(lambda: broadcast_ledger_change(portfolio_id))
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_ledger(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    instance._previous_ledger = (
+        Transaction.objects.filter(pk=instance.pk).values_list('portfolio_id', 'coin_id').first()
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def update_position_on_save(sender, instance, created, **kwargs):
+    if created:
+        record_transaction(instance)
+    else:
+        # An edit may move the entry in time or to another coin: replay the
+        # ledgers it left and joined.
+        rebuild_position(instance.portfolio, instance.coin_id)
+        previous = getattr(instance, '_previous_ledger', None)
+        if previous and previous != (instance.portfolio_id, instance.coin_id):
+            portfolio_id, coin_id = previous
+            rebuild_position(Portfolio.objects.get(pk=portfolio_id), coin_id)
+            if portfolio_id != instance.portfolio_id:
+                _notify_ledger_change(portfolio_id)
+    _notify_ledger_change(instance.portfolio_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_position_on_delete(sender, instance, origin=None, **kwargs):
+    # Positions cascade with their portfolio; nothing to rebuild.
+    if isinstance(origin, Portfolio):
+        return
+    rebuild_position(instance.portfolio, instance.coin_id)
+    _notify_ledger_change(instance.portfolio_id)
+
+
+@receiver(post_save, sender=PriceAlert)
+def track_price_alert(sender, instance, created, **kwargs):
+    if created:
+        db_transaction.on_commit(lambda: alert_service.track(instance))
+
+
+@receiver(post_delete, sender=PriceAlert)
+def untrack_price_alert(sender, instance, **kwargs):
+    alert_id = instance.id
+    db_transaction.on_commit(lambda: alert_service.untrack(alert_id))
+
+
 # from django.db.models.signals import post_migrate
 # from django.db import transaction
 # from django.dispatch import receiver
@@ -0,0 +1,207 @@
+import logging
+import math
+import os
+import time
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# One fixed-width little-endian record per fetched price (32 bytes).
+TICK_DTYPE = np.dtype([
+    ("ts", "<f8"),            # fetch time, epoch seconds
+    ("usd", "<f8"),
+    ("change_24h", "<f8"),
+    ("last_updated", "<i8"),  # CoinGecko's last_updated_at, epoch seconds
+])
+
+SEGMENT_SUFFIX = ".ticks"
+MAX_READ_SPAN = 31 * 86400      # Longest range a single read may cover, in seconds
+MAX_TS = 253402300799           # 9999-12-31T23:59:59Z
+_COIN_ID_RE = re.compile(r"^[a-z0-9][a-z0-9._-]*$")
+
+
+def _segment_day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _check_range(start: float, end: float) -> None:
+    if not (math.isfinite(start) and math.isfinite(end)):
+        raise ValueError("start and end must be finite")
+    if not (0 <= start <= MAX_TS and 0 <= end <= MAX_TS):
+        raise ValueError(f"start and end must be between 0 and {MAX_TS}")
+    if end - start > MAX_READ_SPAN:
+        raise ValueError(f"Range may not exceed {MAX_READ_SPAN // 86400} days")
+
+
+class TickArchive:
+    """
+    Append-only on-disk archive of price ticks.
+
+    Layout is ``<root>/<coin_id>/<YYYY-MM-DD>.ticks`` (UTC days), each file a
+    flat array of ``TICK_DTYPE`` records in fetch order. Writers append with
+    O_APPEND so several workers can share a directory; readers map segments
+    with ``np.memmap`` and never load more than the requested range.
+    Concurrent writers can still interleave slightly out of ``ts`` order, so
+    readers sort a segment before bisecting it when needed.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> str:
+        return str(self._root or settings.TICK_ARCHIVE_DIR)
+
+    def _coin_dir(self, coin_id: str) -> str:
+        coin_id = coin_id.lower()
+        if not _COIN_ID_RE.match(coin_id):
+            raise ValueError(f"Invalid coin id: {coin_id!r}")
+        return os.path.join(self.root, coin_id)
+
+    def _segment_path(self, coin_id: str, day: str) -> str:
+        return os.path.join(self._coin_dir(coin_id), f"{day}{SEGMENT_SUFFIX}")
+
+    # ---- writing -------------------------------------------------------
+
+    def append(self, coin_id: str, records: np.ndarray) -> None:
+        records = np.asarray(records, dtype=TICK_DTYPE)
+        if not len(records):
+            return
+
+        coin_dir = self._coin_dir(coin_id)
+        os.makedirs(coin_dir, exist_ok=True)
+
+        days = np.array([_segment_day(ts) for ts in records["ts"]])
+        for day in np.unique(days):
+            chunk = records[days == day].tobytes()
+            fd = os.open(
+                self._segment_path(coin_id, day),
+                os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                0o644,
+            )
+            try:
+                os.write(fd, chunk)
+            finally:
+                os.close(fd)
+
+    def append_prices(self, prices: Dict, ts: Optional[float] = None) -> None:
+        """Archive a ``simple/price`` response body, stamped at write time unless ``ts`` is given."""
+        if ts is None:
+            ts = time.time()
+        for coin_id, data in prices.items():
+            if not isinstance(data, dict) or "usd" not in data:
+                continue
+            record = np.array([(
+                ts,
+                data.get("usd") or 0.0,
+                data.get("usd_24h_change") or 0.0,
+                data.get("last_updated_at") or 0,
+            )], dtype=TICK_DTYPE)
+            try:
+                self.append(coin_id, record)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Could not archive tick for {coin_id}: {e}")
+
+    # ---- reading -------------------------------------------------------
+
+    def _map_segment(self, path: str) -> np.ndarray:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.empty(0, dtype=TICK_DTYPE)
+
+        # Ignore a torn trailing record left by an interrupted write.
+        count = size // TICK_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.memmap(path, dtype=TICK_DTYPE, mode="r", shape=(count,))
+
+    def _segment_days(self, coin_id: str, first_day: str, last_day: str) -> List[str]:
+        """Days between ``first_day`` and ``last_day`` (inclusive) that have a segment on disk."""
+        try:
+            names = os.listdir(self._coin_dir(coin_id))
+        except FileNotFoundError:
+            return []
+        days = (name[:-len(SEGMENT_SUFFIX)] for name in names if name.endswith(SEGMENT_SUFFIX))
+        # ISO dates compare correctly as strings.
+        return sorted(day for day in days if first_day <= day <= last_day)
+
+    def coins(self) -> List[str]:
+        try:
+            return sorted(
+                name for name in os.listdir(self.root)
+                if os.path.isdir(os.path.join(self.root, name))
+            )
+        except FileNotFoundError:
+            return []
+
+    def read(self, coin_id: str, start: float, end: float) -> np.ndarray:
+        """
+        Return all ticks for ``coin_id`` with ``start <= ts < end``, in ``ts`` order.
+
+        Raises ``ValueError`` for non-finite or out-of-range bounds and for
+        ranges longer than ``MAX_READ_SPAN``.
+        """
+        _check_range(start, end)
+        if end <= start:
+            return np.empty(0, dtype=TICK_DTYPE)
+
+        parts = []
+        for day in self._segment_days(coin_id, _segment_day(start), _segment_day(end)):
+            ticks = self._map_segment(self._segment_path(coin_id, day))
+            if not len(ticks):
+                continue
+            ts = ticks["ts"]
+            if np.any(ts[1:] < ts[:-1]):
+                ticks = ticks[np.argsort(ts, kind="stable")]
+                ts = ticks["ts"]
+            lo = np.searchsorted(ts, start, side="left")
+            hi = np.searchsorted(ts, end, side="left")
+            if hi > lo:
+                parts.append(ticks[lo:hi])
+
+        if not parts:
+            return np.empty(0, dtype=TICK_DTYPE)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def downsample(self, coin_id: str, start: float, end: float, interval: float) -> Dict[str, np.ndarray]:
+        """
+        Bucket ticks into ``interval``-second OHLC bars.
+
+        Empty buckets are omitted; ``ts`` is the bucket start.
+        """
+        if not math.isfinite(interval) or interval <= 0:
+            raise ValueError("interval must be positive")
+
+        ticks = self.read(coin_id, start, end)
+        if not len(ticks):
+            empty = np.empty(0, dtype="<f8")
+            return {"ts": empty, "open": empty, "high": empty, "low": empty, "close": empty, "count": np.empty(0, dtype="<i8")}
+
+        ts = np.asarray(ticks["ts"])
+        usd = np.asarray(ticks["usd"])
+        buckets = ((ts - start) // interval).astype(np.int64)
+
+        # Ticks are time-ordered, so bucket ids are non-decreasing.
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)]
+
+        return {
+            "ts": start + buckets[starts] * interval,
+            "open": usd[starts],
+            "high": np.maximum.reduceat(usd, starts),
+            "low": np.minimum.reduceat(usd, starts),
+            "close": usd[ends - 1],
+            "count": ends - starts,
+        }
+
+
+# Singleton
+tick_archive = TickArchive()
@@ -7,6 +7,11 @@ urlpatterns = [
     path('portfolios/<int:portfolio_id>/transactions/', views.portfolio_transactions, name='portfolio-transactions'),
     path('portfolios/<int:portfolio_id>/transactions/<int:transaction_id>/', views.remove_transaction, name='remove-transaction'),
     path('portfolios/<int:portfolio_id>/analytics/', views.portfolio_analytics_view, name='portfolio-analytics'),
+    path('portfolios/<int:portfolio_id>/alerts/', views.portfolio_alerts, name='portfolio-alerts'),
+    path('portfolios/<int:portfolio_id>/alerts/<int:alert_id>/', views.remove_alert, name='remove-alert'),
+    path('debug/profiles/', views.profile_reports, name='profile-reports'),
+    path('debug/profiles/<int:report_id>/', views.profile_report, name='profile-report'),
     path('coins/search/', views.search_coins, name='search-coins'),
     path('coins/prices/', views.coin_prices, name='coin-prices'),
+    path('coins/<str:coin_id>/history/', views.coin_history, name='coin-history'),
 ]
\ No newline at end of file
@@ -0,0 +1,153 @@
+import logging
+from typing import Dict, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+PRICE_TICKS_GROUP = "price_ticks"
+
+
+def portfolio_group(portfolio_id) -> str:
+    return f"portfolio_{portfolio_id}"
+
+
+class PortfolioValuation:
+    """
+    Cached holdings for one portfolio, revalued as prices tick.
+
+    A price update only touches the coins whose price moved and adjusts the
+    running totals by their difference, so a tick costs O(changed coins)
+    instead of a full ``calculate_portfolio_metrics`` pass.
+    """
+
+    def __init__(self):
+        self.holdings: Dict[str, Dict] = {}
+        self.prices: Dict[str, float] = {}
+        self.entries: Dict[str, Dict] = {}
+        self.totals = {
+            'total_value': 0.0,
+            'total_cost': 0.0,
+            'realized_profit_loss': 0.0,
+            'invested': 0.0,
+        }
+
+    def _entry(self, coin_id: str) -> Dict:
+        holding = self.holdings[coin_id]
+        price = self.prices.get(coin_id, 0.0)
+        value = holding['quantity'] * price
+        return {
+            'coin_id': coin_id,
+            'coin_name': holding['coin_name'],
+            'coin_symbol': holding['coin_symbol'],
+            'quantity': holding['quantity'],
+            'price': price,
+            'value': value,
+            'cost': holding['cost'],
+            'realized_profit_loss': holding['realized_pnl'],
+            'unrealized_profit_loss': value - holding['cost'],
+            'invested': holding['invested'],
+        }
+
+    def _add(self, entry: Dict, sign: int):
+        self.totals['total_value'] += sign * entry['value']
+        self.totals['total_cost'] += sign * entry['cost']
+        self.totals['realized_profit_loss'] += sign * entry['realized_profit_loss']
+        self.totals['invested'] += sign * entry['invested']
+
+    def _revalue(self, coin_id: str):
+        old = self.entries.pop(coin_id, None)
+        if old:
+            self._add(old, -1)
+        if coin_id in self.holdings:
+            entry = self._entry(coin_id)
+            self.entries[coin_id] = entry
+            self._add(entry, 1)
+
+    def set_positions(self, positions: Iterable) -> Set[str]:
+        """
+        Replace cached holdings (positions need ``coin`` loaded); returns the
+        coins whose entry changed or vanished.
+        """
+        holdings = {
+            p.coin.coingecko_id.lower(): {
+                'quantity': p.quantity,
+                'cost': p.cost,
+                'realized_pnl': p.realized_pnl,
+                'invested': p.invested,
+                'coin_name': p.coin.name,
+                'coin_symbol': p.coin.symbol,
+            }
+            for p in positions
+        }
+        changed = {
+            coin_id for coin_id in set(holdings) | set(self.holdings)
+            if holdings.get(coin_id) != self.holdings.get(coin_id)
+        }
+        self.holdings = holdings
+        for coin_id in changed:
+            self._revalue(coin_id)
+        return changed
+
+    def set_prices(self, prices: Dict) -> Set[str]:
+        """Apply a ``simple/price`` body; returns held coins whose price moved."""
+        changed = set()
+        for coin_id, data in prices.items():
+            coin_id = coin_id.lower()
+            if coin_id not in self.holdings or not isinstance(data, dict) or data.get('usd') is None:
+                continue
+            price = float(data['usd'])
+            if self.prices.get(coin_id) != price:
+                self.prices[coin_id] = price
+                self._revalue(coin_id)
+                changed.add(coin_id)
+        return changed
+
+    def missing_prices(self):
+        return sorted(
+            coin_id for coin_id, h in self.holdings.items()
+            if h['quantity'] > 0 and coin_id not in self.prices
+        )
+
+    def open_coin_ids(self):
+        return sorted(coin_id for coin_id, h in self.holdings.items() if h['quantity'] > 0)
+
+    def summary(self) -> Dict:
+        totals = self.totals
+        unrealized = totals['total_value'] - totals['total_cost']
+        profit_loss = totals['realized_profit_loss'] + unrealized
+        return {
+            'total_value': totals['total_value'],
+            'total_cost': totals['total_cost'],
+            'realized_profit_loss': totals['realized_profit_loss'],
+            'unrealized_profit_loss': unrealized,
+            'total_profit_loss': profit_loss,
+            'profit_loss_percentage': (profit_loss / totals['invested'] * 100) if totals['invested'] else 0,
+        }
+
+    def delta(self, changed: Set[str]) -> Dict:
+        return {
+            'coins': {c: self.entries[c] for c in sorted(changed) if c in self.entries},
+            'removed': sorted(c for c in changed if c not in self.entries),
+            'totals': self.summary(),
+        }
+
+
+def _group_send(group: str, message: Dict):
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, message)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not notify {group}: {e}")
+
+
+def broadcast_prices(prices: Dict):
+    """Fan a fresh upstream tick out to live valuation streams (sync context)."""
+    _group_send(PRICE_TICKS_GROUP, {'type': 'price_tick', 'prices': prices})
+
+
+def broadcast_ledger_change(portfolio_id):
+    _group_send(portfolio_group(portfolio_id), {'type': 'ledger_changed'})
@@ -3,17 +3,24 @@ from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime
 
-from .models import Portfolio, Transaction
-from .services import coingecko_service, portfolio_analytics
+from .models import Coin, Portfolio, PriceAlert, Transaction
+from .alerts import ALERT_DIRECTIONS
+from .lots import COST_BASIS_METHODS, FIFO
+from .coingecko import get_coingecko_service
+from .services import get_portfolio_analytics
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
 from .models import Portfolio
+from django.db import transaction as db_transaction
 from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 from dataclasses import asdict
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -25,19 +32,20 @@ def portfolios(request):
             portfolios = Portfolio.objects.all().order_by('-created_at')
             result = []
             for p in portfolios:
-                transactions = p.transactions.all()
+                transactions = p.transactions.select_related('coin')
 
                 result.append({
                     'id': p.id,
                     'name': p.name,
                     'created_at': p.created_at.isoformat(),
+                    'cost_basis_method': p.cost_basis_method,
                     'transaction_count': transactions.count(),
                     'transactions': [
                         {
                             'id': t.id,
-                            'coin_id': t.coin_id,
-                            'coin_name': t.coin_name,
-                            'coin_symbol': t.coin_symbol,
+                            'coin_id': t.coin.coingecko_id,
+                            'coin_name': t.coin.name,
+                            'coin_symbol': t.coin.symbol,
                             'amount': t.amount,
                             'price_usd': t.price_usd,
                             'transaction_type': t.transaction_type,
@@ -63,12 +71,17 @@ def portfolios(request):
                     'debug': {'data': str(data)}
                 }, status=400)
 
-            portfolio = Portfolio.objects.create(name=name)
+            cost_basis_method = data.get('cost_basis_method', FIFO)
+            if cost_basis_method not in dict(COST_BASIS_METHODS):
+                return Response({'error': f'Unknown cost basis method: {cost_basis_method}'}, status=400)
+
+            portfolio = Portfolio.objects.create(name=name, cost_basis_method=cost_basis_method)
 
             return Response({
                 'id': portfolio.id,
                 'name': portfolio.name,
                 'created_at': portfolio.created_at.isoformat(),
+                'cost_basis_method': portfolio.cost_basis_method,
                 'transaction_count': 0,
                 'transactions': []
             }, status=201)
@@ -89,18 +102,19 @@ def portfolio_detail(request, portfolio_id):
         return Response({'error': 'Portfolio not found'}, status=404)
 
     if request.method == 'GET':
-        transactions = portfolio.transactions.all()
+        transactions = portfolio.transactions.select_related('coin')
         return Response({
             'id': portfolio.id,
             'name': portfolio.name,
             'created_at': portfolio.created_at.isoformat(),
+            'cost_basis_method': portfolio.cost_basis_method,
             'transaction_count': transactions.count(),
             'transactions': [
                 {
                     'id': t.id,
-                    'coin_id': t.coin_id,
-                    'coin_name': t.coin_name,
-                    'coin_symbol': t.coin_symbol,
+                    'coin_id': t.coin.coingecko_id,
+                    'coin_name': t.coin.name,
+                    'coin_symbol': t.coin.symbol,
                     'amount': t.amount,
                     'price_usd': t.price_usd,
                     'transaction_type': t.transaction_type,
@@ -123,14 +137,14 @@ def portfolio_transactions(request, portfolio_id):
         return Response({'error': 'Portfolio not found'}, status=404)
 
     if request.method == 'GET':
-        transactions = portfolio.transactions.all()
+        transactions = portfolio.transactions.select_related('coin')
         return Response({
             'transactions': [
                 {
                     'id': t.id,
-                    'coin_id': t.coin_id,
-                    'coin_name': t.coin_name,
-                    'coin_symbol': t.coin_symbol,
+                    'coin_id': t.coin.coingecko_id,
+                    'coin_name': t.coin.name,
+                    'coin_symbol': t.coin.symbol,
                     'amount': t.amount,
                     'price_usd': t.price_usd,
                     'transaction_type': t.transaction_type,
@@ -144,20 +158,26 @@ def portfolio_transactions(request, portfolio_id):
     elif request.method == 'POST':
         data = request.data
         try:
-            transaction = Transaction.objects.create(
-                portfolio=portfolio,
-                coin_id=data['coin_id'],
-                coin_name=data['coin_name'],
-                coin_symbol=data['coin_symbol'].upper(),
-                amount=float(data['amount']),
-                price_usd=float(data['price_usd']),
-                transaction_type=data['transaction_type']
-            )
+            # The position update runs in post_save; keep it in the same
+            # transaction so a failure can't leave the ledger ahead of it.
+            with db_transaction.atomic():
+                # Prices, positions and valuations all key on the lowercase id.
+                coin, _ = Coin.objects.get_or_create(
+                    coingecko_id=data['coin_id'].lower(),
+                    defaults={'name': data['coin_name'], 'symbol': data['coin_symbol'].upper()}
+                )
+                transaction = Transaction.objects.create(
+                    portfolio=portfolio,
+                    coin=coin,
+                    amount=float(data['amount']),
+                    price_usd=float(data['price_usd']),
+                    transaction_type=data['transaction_type']
+                )
             return Response({
                 'id': transaction.id,
-                'coin_id': transaction.coin_id,
-                'coin_name': transaction.coin_name,
-                'coin_symbol': transaction.coin_symbol,
+                'coin_id': transaction.coin.coingecko_id,
+                'coin_name': transaction.coin.name,
+                'coin_symbol': transaction.coin.symbol,
                 'amount': transaction.amount,
                 'price_usd': transaction.price_usd,
                 'transaction_type': transaction.transaction_type,
@@ -173,21 +193,59 @@ def remove_transaction(request, portfolio_id, transaction_id):
         transaction = Transaction.objects.get(id=transaction_id, portfolio_id=portfolio_id)
     except Transaction.DoesNotExist:
         return Response({'error': 'Transaction not found'}, status=404)
-    transaction.delete()
+    with db_transaction.atomic():
+        transaction.delete()
     return Response({'message': 'Transaction deleted'})
 
-@api_view(["GET"])
-def portfolio_analytics_view(request, portfolio_id):
+@api_view(['GET', 'POST'])
+def portfolio_alerts(request, portfolio_id):
     try:
         portfolio = Portfolio.objects.get(id=portfolio_id)
+    except Portfolio.DoesNotExist:
+        return Response({'error': 'Portfolio not found'}, status=404)
+
+    if request.method == 'GET':
+        alerts = portfolio.alerts.all().order_by('-created_at')
+        return Response({'alerts': [a.to_dict() for a in alerts]})
+
+    elif request.method == 'POST':
+        data = request.data
+        try:
+            direction = data['direction']
+            if direction not in dict(ALERT_DIRECTIONS):
+                return Response({'error': f'Unknown direction: {direction}'}, status=400)
+
+            alert = PriceAlert.objects.create(
+                portfolio=portfolio,
+                coin_id=data['coin_id'].lower(),
+                direction=direction,
+                threshold=float(data['threshold'])
+            )
+            return Response(alert.to_dict(), status=201)
+        except Exception as e:
+            return Response({'error': str(e)}, status=400)
+
+@api_view(['DELETE'])
+def remove_alert(request, portfolio_id, alert_id):
+    try:
+        alert = PriceAlert.objects.get(id=alert_id, portfolio_id=portfolio_id)
+    except PriceAlert.DoesNotExist:
+        return Response({'error': 'Alert not found'}, status=404)
+    alert.delete()
+    return Response({'message': 'Alert deleted'})
+
+@require_GET
+async def portfolio_analytics_view(request, portfolio_id):
+    try:
+        portfolio = await Portfolio.objects.aget(id=portfolio_id)
     except Portfolio.DoesNotExist:
         return JsonResponse({"error": "Portfolio not found"}, status=404)
 
-    metrics = portfolio_analytics.calculate_portfolio_metrics(portfolio)
+    metrics = await get_portfolio_analytics().acalculate_portfolio_metrics(portfolio)
 
     debug_info = {
-        "transaction_count": portfolio.transactions.count(),
-        "coin_ids": list(set(tx.coin_id for tx in portfolio.transactions.all()))
+        "transaction_count": await portfolio.transactions.acount(),
+        "coin_ids": [p.coin.coingecko_id async for p in portfolio.positions.select_related('coin')]
     }
 
     return JsonResponse({
@@ -195,45 +253,123 @@ def portfolio_analytics_view(request, portfolio_id):
         "debug": debug_info
     })
 
-@api_view(['GET'])
-def search_coins(request):
+@require_GET
+async def search_coins(request):
     """Search for cryptocurrencies"""
     query = request.GET.get('q', '').strip()
     results = []
 
     if query:
         try:
-            results = coingecko_service.search_coins(query)
+            results = await get_coingecko_service().asearch_coins(query)
         except Exception as e:
-            print(f"CoinGecko search error: {e}")
+            logger.warning(f"CoinGecko search error: {e}")
 
-    return Response({'coins': results})
+    return JsonResponse({'coins': results})
 
 
-@api_view(['GET'])
-def coin_prices(request):
+@require_GET
+async def coin_prices(request):
     """Get current prices for specified coins"""
     coin_ids = request.GET.get('ids', '').strip()
     if not coin_ids:
-        return Response({'prices': {}})
+        return JsonResponse({'prices': {}})
 
     coin_list = [coin.strip() for coin in coin_ids.split(',') if coin.strip()]
     try:
-        prices = coingecko_service.get_detailed_coin_data(coin_list)
+        prices = await get_coingecko_service().aget_market_data(coin_list)
         formatted = {
             coin_id: {
-                'id': c.id,
-                'symbol': c.symbol,
-                'name': c.name,
-                'current_price': c.current_price,
-                'price_change_24h': c.price_change_24h,
-                'price_change_percentage_24h': round(c.price_change_percentage_24h, 2),
-                'market_cap': c.market_cap,
-                'volume_24h': c.volume_24h,
-                'last_updated': c.last_updated.isoformat()
+                'id': c['id'],
+                'symbol': c['symbol'],
+                'name': c['name'],
+                'current_price': c['current_price'],
+                'price_change_24h': c['price_change_24h'],
+                'price_change_percentage_24h': round(c['price_change_percentage_24h'] or 0, 2),
+                'market_cap': c['market_cap'],
+                'volume_24h': c['total_volume'],
+                'last_updated': c['last_updated']
             } for coin_id, c in prices.items()
         }
-        return Response({'prices': formatted})
+        return JsonResponse({'prices': formatted})
     except Exception as e:
-        print(f"Price fetch error: {e}")
-        return Response({'error': str(e)}, status=500)
+        logger.warning(f"Price fetch error: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@api_view(['GET'])
+def coin_history(request, coin_id):
+    """Archived price ticks for a coin, optionally downsampled to OHLC bars"""
+    from .tick_archive import tick_archive
+
+    try:
+        end = float(request.GET.get('end', time.time()))
+        start = float(request.GET.get('start', end - 86400))
+        interval = request.GET.get('interval')
+
+        if interval:
+            bars = tick_archive.downsample(coin_id, start, end, float(interval))
+            return Response({
+                'coin_id': coin_id,
+                'interval': float(interval),
+                'bars': [
+                    {
+                        'timestamp': float(bars['ts'][i]),
+                        'open': float(bars['open'][i]),
+                        'high': float(bars['high'][i]),
+                        'low': float(bars['low'][i]),
+                        'close': float(bars['close'][i]),
+                        'count': int(bars['count'][i]),
+                    }
+                    for i in range(len(bars['ts']))
+                ]
+            })
+
+        ticks = tick_archive.read(coin_id, start, end)
+        return Response({
+            'coin_id': coin_id,
+            'ticks': [
+                {
+                    'timestamp': float(t['ts']),
+                    'usd': float(t['usd']),
+                    'usd_24h_change': float(t['change_24h']),
+                    'last_updated_at': int(t['last_updated']),
+                }
+                for t in ticks
+            ]
+        })
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+
+
+@staff_member_required
+def profile_reports(request):
+    """Recent profiling reports from this process (summaries, newest first)"""
+    from .profiling import get_reports
+
+    return JsonResponse({'reports': [
+        {
+            'id': r['id'],
+            'kind': r['kind'],
+            'name': r['name'],
+            'trigger': r['trigger'],
+            'created_at': r['created_at'],
+            'duration_ms': r['duration_ms'],
+            'sql_count': r['sql']['count'],
+            'sql_ms': r['sql']['total_ms'],
+            'get_prices_ms': r['spans'].get('get_prices', {}).get('total_ms', 0),
+        }
+        for r in get_reports()
+    ]})
+
+
+@staff_member_required
+def profile_report(request, report_id):
+    """Full profiling report"""
+    from .profiling import get_report
+
+    report = get_report(report_id)
+    if report is None:
+        return JsonResponse({'error': 'Report not found'}, status=404)
+    return JsonResponse(report)
@@ -0,0 +1,96 @@
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(report, name, fn):
+    start = time.perf_counter()
+    try:
+        fn()
+        report[name] = {'ok': True}
+    except Exception as e:
+        # Details stay in the log; the report may be returned over HTTP.
+        logger.warning(f"⚠️ Warm-up step '{name}' failed: {e}")
+        report[name] = {'ok': False}
+    report[name]['ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _connect_databases():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _connect_cache():
+    cache.get('warmup:ping')
+
+
+def _load_code():
+    # Import what the first real request would otherwise pay for.
+    from django.urls import get_resolver
+    from . import views  # noqa: F401  (pulls in DRF)
+    from . import consumers  # noqa: F401  (pulls in channels)
+    from .tick_archive import tick_archive  # noqa: F401  (pulls in NumPy)
+
+    get_resolver().url_patterns
+
+
+def _connect_http():
+    from .coingecko import PROXY_URL, get_coingecko_service
+
+    service = get_coingecko_service()
+    service.session.head(PROXY_URL.split('/get?')[0], timeout=3)
+
+
+def _hot_coin_sets():
+    """
+    The id sets readers actually request: price cache keys hash the exact
+    set, so each one is primed on its own rather than as one union.
+    """
+    from .consumers import DEFAULT_COINS
+    from .lots import EPSILON
+    from .models import Position
+
+    held = {}
+    rows = Position.objects.filter(quantity__gt=EPSILON).values_list('portfolio_id', 'coin__coingecko_id')
+    for portfolio_id, coin_id in rows.iterator():
+        held.setdefault(portfolio_id, set()).add(coin_id.lower())
+    # The price socket's defaults, then each portfolio's analytics / valuation set.
+    sets = {tuple(sorted(set(DEFAULT_COINS)))}
+    sets.update(tuple(sorted(coin_ids)) for coin_ids in held.values())
+    return sorted(sets)
+
+
+def _preload_prices():
+    from .coingecko import get_coingecko_service
+
+    service = get_coingecko_service()
+    for coin_ids in _hot_coin_sets():
+        service.get_prices(list(coin_ids))
+
+
+def _load_alerts():
+    from .alerts import alert_service
+
+    alert_service.ensure_loaded()
+
+
+def warm_up():
+    """
+    Pre-connect DB, cache and HTTP pools and prime hot price keys.
+
+    Each step is independent; failures are reported, never raised.
+    """
+    report = {}
+    _timed(report, 'code', _load_code)
+    _timed(report, 'database', _connect_databases)
+    _timed(report, 'cache', _connect_cache)
+    _timed(report, 'http', _connect_http)
+    _timed(report, 'alerts', _load_alerts)
+    if settings.WARMUP_PRELOAD_PRICES:
+        _timed(report, 'prices', _preload_prices)
+    logger.info(f"🔥 Warm-up finished: {report}")
+    return report